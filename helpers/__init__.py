@@ -12,7 +12,14 @@ import psutil
 from datetime import datetime, timedelta
 
 from .parser import Parser  # noqa: F401
-from .parser import ParserWindow  # noqa: F401
+
+
+def __getattr__(name):
+    # ParserWindow pulls in Qt, import it on first use so the parsing core can run headless
+    if name == 'ParserWindow':
+        from .parserwindow import ParserWindow
+        return ParserWindow
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
 
 
 def get_version():
@@ -25,14 +32,49 @@ def get_version():
     return version
 
 
+MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+
+# (prefix, datetime) of the last converted timestamp, log lines arrive in bursts within the same second
+_last_timestamp = ('', None)
+
+
+def parse_timestamp(line):
+    """
+    Returns the datetime of an everquest log entry's '[Mon Oct 18 20:11:02 2026]' prefix,
+    or None if the line does not start with a valid timestamp.
+    """
+    global _last_timestamp
+    prefix = line[:26]
+    if prefix == _last_timestamp[0]:
+        return _last_timestamp[1]
+    try:
+        if prefix[0] != '[' or prefix[25] != ']':
+            return None
+        timestamp = datetime(
+            int(prefix[21:25]),
+            MONTHS[prefix[5:8]],
+            int(prefix[9:11]),
+            int(prefix[12:14]),
+            int(prefix[15:17]),
+            int(prefix[18:20])
+        )
+    except (IndexError, KeyError, ValueError):
+        return None
+    _last_timestamp = (prefix, timestamp)
+    return timestamp
+
+
 def parse_line(line):
     """
     Parses and then returns an everquest log entry's date and text.
     """
-    index = line.find("]") + 1
-    sdate = line[1:index - 1].strip()
-    text = line[index:].strip()
-    return datetime.strptime(sdate, '%a %b %d %H:%M:%S %Y'), text
+    timestamp = parse_timestamp(line)
+    if timestamp is None:
+        raise ValueError('Invalid log timestamp: %s' % line[:26])
+    return timestamp, line[26:].strip()
 
 
 def strip_timestamp(line):
@@ -62,6 +62,28 @@ def verify_settings():
         data['general'].get('update_check', True),
         True
     )
+    data['general']['use_log_timestamps'] = get_setting(
+        data['general'].get('use_log_timestamps', True),
+        True
+    )
+    data['general']['log_watcher'] = get_setting(
+        data['general'].get('log_watcher', 'auto'),
+        'auto',
+        lambda x: x in ('auto', 'qt', 'inotify', 'polling')
+    )
+    data['general']['catch_up'] = get_setting(
+        data['general'].get('catch_up', False),
+        False
+    )
+    data['general']['catch_up_minutes'] = get_setting(
+        data['general'].get('catch_up_minutes', 30),
+        30,
+        lambda x: (1 <= x <= 1440)
+    )
+    data['general']['catch_up_to_login'] = get_setting(
+        data['general'].get('catch_up_to_login', True),
+        True
+    )
 
     # sharing
     data['sharing'] = data.get('sharing', {})
@@ -235,6 +257,10 @@ def verify_settings():
         ["levitate"],
         lambda x: isinstance(x, list)
         )
+    data['spells']['use_list_view'] = get_setting(
+        data['spells'].get('use_list_view', False),
+        False
+        )
     data['spells']['use_secondary_all'] = get_setting(
         data['spells'].get('use_secondary_all', False),
         False
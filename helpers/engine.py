@@ -0,0 +1,232 @@
+"""
+Headless parsing engine: reads Everquest logs without Qt and drives Parser state machines.
+"""
+import os
+import time
+
+from helpers import config
+from helpers.logtail import (CATCH_UP_BLOCK, LOGIN_MARKER, LogTail,
+                             parse_log_file_name, stamp_lines)
+from helpers.triggers import TriggerRegistry
+from helpers.watchers import create_watcher
+
+LOGIN_TEXT = LOGIN_MARKER.decode()
+
+
+class _TimedRegistry:
+    """Registers the triggers of one parser in a registry, adding the time its handlers take to timings."""
+
+    def __init__(self, registry, name, timings):
+        self._registry = registry
+        self._name = name
+        self._timings = timings
+        self._timed_handlers = {}  # handler: timed handler, one per handler keeps them called once per line
+
+    def add_text(self, text, handler):
+        self._registry.add_text(text, self._timed(handler))
+
+    def add_prefix(self, prefix, handler):
+        self._registry.add_prefix(prefix, self._timed(handler))
+
+    def add_suffix(self, suffix, handler):
+        self._registry.add_suffix(suffix, self._timed(handler))
+
+    def add_regex(self, pattern, handler, flags=0):
+        self._registry.add_regex(pattern, self._timed(handler), flags)
+
+    def add_line_handler(self, handler):
+        self._registry.add_line_handler(self._timed(handler))
+
+    def _timed(self, handler):
+        if handler in self._timed_handlers:
+            return self._timed_handlers[handler]
+        timings, name = self._timings, self._name
+
+        def timed(*args):
+            start = time.perf_counter()
+            handler(*args)
+            timings[name] += time.perf_counter() - start
+        self._timed_handlers[handler] = timed
+        return timed
+
+
+class Engine:
+    """
+    Feeds log lines to a list of parsers and relays the Events of those that publish
+    them (see parsers.trackers) to subscribers.
+
+    Lines are handed out like the application does: those of the active character are
+    matched once against the triggers of every parser, those of other characters go
+    to the parsers following all characters.
+
+    The engine can replay a log file from start to finish as fast as the parsers allow,
+    or follow a logs directory like LogReader does, using a helpers.watchers backend.
+    """
+
+    def __init__(self, parsers=()):
+        self.parsers = []
+        self.timings = None  # {parser name: seconds spent parsing} once profiling is enabled
+        self._subscribers = {}  # event name: [callback], '*' for every event
+        self._triggers = TriggerRegistry()  # triggers of all parsers
+        for parser in parsers:
+            self.add_parser(parser)
+
+    def add_parser(self, parser):
+        self.parsers.append(parser)
+        if hasattr(parser, 'subscribe'):
+            parser.subscribe(self._publish)
+        self._register(parser)
+
+    def _register(self, parser):
+        if self.timings is None:
+            parser.register_triggers(self._triggers)
+        else:
+            parser.register_triggers(_TimedRegistry(self._triggers, parser.name, self.timings))
+
+    def subscribe(self, callback, event='*'):
+        """Call callback(Event) for each event named event, or for all events with '*'."""
+        self._subscribers.setdefault(event, []).append(callback)
+
+    def _publish(self, event):
+        for callback in self._subscribers.get(event.name, ()):
+            callback(event)
+        for callback in self._subscribers.get('*', ()):
+            callback(event)
+
+    def enable_profiling(self):
+        """
+        Time the handlers of each parser, the time spent matching lines to them is
+        counted as 'dispatch'.
+        """
+        self.timings = {parser.name: 0.0 for parser in self.parsers}
+        self.timings['dispatch'] = 0.0
+        self._triggers.clear()
+        for parser in self.parsers:
+            self._register(parser)
+
+    def feed(self, lines):
+        """Parse a batch of LogLines, or (datetime, text) lines of the active character."""
+        if not lines:
+            return
+        if self.timings is None:
+            self._dispatch(lines)
+            return
+        handled = sum(self.timings.values())
+        start = time.perf_counter()
+        self._dispatch(lines)
+        elapsed = time.perf_counter() - start
+        self.timings['dispatch'] += elapsed - (sum(self.timings.values()) - handled)
+
+    def _dispatch(self, lines):
+        if getattr(lines, 'char_name', config.char_name) == config.char_name:
+            # match each line once against the triggers of every parser
+            dispatch = self._triggers.dispatch
+            for timestamp, text in lines:
+                dispatch(timestamp, text)
+            return
+        for parser in self.parsers:
+            if parser.follow_all_characters:
+                if self.timings is None:
+                    parser.parse_batch(lines)
+                else:
+                    start = time.perf_counter()
+                    parser.parse_batch(lines)
+                    self.timings[parser.name] += time.perf_counter() - start
+
+    def _feed_paced(self, lines, speed, previous=None):
+        """
+        Parse lines no faster than speed times the rate they were logged at.
+
+        Returns:
+            datetime: timestamp of the last line, to pass as previous for the next batch
+        """
+        start = 0
+        for index in range(1, len(lines) + 1):
+            if index == len(lines) or lines[index][0] != lines[start][0]:
+                timestamp = lines[start][0]
+                if previous and timestamp > previous:
+                    time.sleep((timestamp - previous).total_seconds() / speed)
+                self.feed(lines[start:index])
+                previous = timestamp
+                start = index
+        return previous
+
+    def flush(self, timestamp=None):
+        for parser in self.parsers:
+            if hasattr(parser, 'flush'):
+                parser.flush(timestamp)
+
+    def replay(self, path, offset=0, speed=None):
+        """
+        Parse a whole log file from offset to its current end.
+
+        Args:
+            path: log file to replay
+            offset: byte offset to start from
+            speed: replay at this multiple of real time, None parses as fast as possible
+
+        Returns:
+            int: number of lines parsed
+        """
+        char_name, server = parse_log_file_name(path)
+        config.char_name = char_name
+        tail = LogTail(path)
+        tail.open(offset)
+        end = os.path.getsize(path)
+        count = 0
+        last = None
+        try:
+            while tail.offset < end:
+                previous_offset = tail.offset
+                lines = tail.read_lines(CATCH_UP_BLOCK)
+                if tail.offset == previous_offset:
+                    break  # the file shrank underneath us
+                if not lines:
+                    continue
+                batch = stamp_lines(lines, True, char_name, server)
+                if speed:
+                    last = self._feed_paced(batch, speed, last)
+                else:
+                    self.feed(batch)
+                count += len(batch)
+                last = batch[-1][0]
+        finally:
+            tail.close()
+        self.flush(last)
+        return count
+
+    def follow(self, eq_directory, backend='auto', running=lambda: True):
+        """
+        Tail every log file in eq_directory until running() returns false, parsing
+        only lines written after the call.  The first log written to, then the log of
+        each character logging in, is the active one.
+        """
+        watcher = create_watcher(eq_directory, backend)
+        # files are only opened once they change, so remember where each one ended
+        start_offsets = {}
+        with os.scandir(eq_directory) as entries:
+            for entry in entries:
+                if entry.name.lower().startswith('eqlog') and entry.is_file():
+                    start_offsets[entry.path] = entry.stat().st_size
+        tails = {}  # path: LogTail
+        try:
+            while running():
+                for path in watcher.wait(1.0):
+                    tail = tails.get(path)
+                    try:
+                        if not tail:
+                            tail = tails[path] = LogTail(path)
+                            tail.open(start_offsets.get(path, 0))
+                        lines = tail.read_lines()
+                    except FileNotFoundError:
+                        tails.pop(path).close()
+                        continue
+                    if lines:
+                        if not config.char_name or any(
+                                line.endswith(LOGIN_TEXT) for line in lines):
+                            config.char_name = tail.char_name
+                        self.feed(stamp_lines(lines, True, tail.char_name, tail.server))
+        finally:
+            for tail in tails.values():
+                tail.close()
+            watcher.close()
@@ -2,31 +2,73 @@ import os
 import datetime
 from glob import glob
 
-from PyQt6.QtCore import QFileSystemWatcher, pyqtSignal
+from PyQt6.QtCore import QFileSystemWatcher, QSocketNotifier, QTimer, pyqtSignal
 
 from helpers import config
 from helpers import location_service
-from helpers import strip_timestamp
+from helpers.logtail import (CATCH_UP_BLOCK, LOGIN_MARKER, LogTail, find_catch_up_offset,
+                             parse_log_file_name, stamp_lines)
+from helpers.watchers import create_watcher, inotify_available
+
+LOGIN_TEXT = LOGIN_MARKER.decode()
 
 
 class LogReader(QFileSystemWatcher):
 
-    new_line = pyqtSignal(object)
+    new_line = pyqtSignal(object)  # (datetime, text)
+    new_lines = pyqtSignal(object)  # LogLines [(datetime, text), ...] per read
+    backlog_lines = pyqtSignal(object)  # LogLines [(datetime, text), ...] replayed on catch-up
+    active_changed = pyqtSignal(str)  # character name
 
     def __init__(self, eq_directory):
         super().__init__()
 
         self._eq_directory = eq_directory
-        self._files = glob(os.path.join(eq_directory, 'eqlog*.txt'))
-        self._watcher = QFileSystemWatcher(self._files)
-        self._watcher.fileChanged.connect(self._file_changed_safe_wrap)
-        self._dir_watcher = QFileSystemWatcher([eq_directory])
-        self._dir_watcher.directoryChanged.connect(self._dir_changed)
-
-        self._stats = {
-            'log_file': '',
-            'last_read': 0,
+        self._backend = None  # helpers.watchers.LogWatcher, None when using QFileSystemWatcher
+        self._notifier = None
+        self._poll_timer = None
+        self._setup_watcher(config.data['general']['log_watcher'])
+
+        self._readers = {}  # path: LogTail, one per log file being tailed
+        # log files are only opened once they change, so remember where each one ended
+        self._start_offsets = {
+            path: os.path.getsize(path)
+            for path in glob(os.path.join(eq_directory, 'eqlog*.txt'))
         }
+        self._active = ''  # path of the most recently active log file
+        self._caught_up = set()  # log files already replayed this session
+
+    def readers(self):
+        """Returns a list of the LogTails of all log files being tailed."""
+        return list(self._readers.values())
+
+    def _setup_watcher(self, backend):
+        if backend == 'qt' or (backend == 'auto' and not inotify_available()):
+            self._files = glob(os.path.join(self._eq_directory, 'eqlog*.txt'))
+            self._watcher = QFileSystemWatcher(self._files)
+            self._watcher.fileChanged.connect(self._file_changed_safe_wrap)
+            self._dir_watcher = QFileSystemWatcher([self._eq_directory])
+            self._dir_watcher.directoryChanged.connect(self._dir_changed)
+            return
+
+        self._backend = create_watcher(self._eq_directory, backend)
+        fd = self._backend.fileno()
+        if fd is not None:
+            self._notifier = QSocketNotifier(fd, QSocketNotifier.Type.Read)
+            self._notifier.activated.connect(self._backend_changed)
+        else:
+            self._poll_timer = QTimer()
+            self._poll_timer.setSingleShot(True)
+            self._poll_timer.timeout.connect(self._backend_changed)
+            self._poll_timer.start(int(self._backend.interval * 1000))
+
+    def _backend_changed(self, *_):
+        if not self._backend:
+            return
+        for changed_file in self._backend.poll():
+            self._file_changed_safe_wrap(changed_file)
+        if self._poll_timer:
+            self._poll_timer.start(int(self._backend.interval * 1000))
 
     def _dir_changed(self, changed_dir):
         print("Directory '%s' updated, refreshing file list..." % changed_dir)
@@ -40,34 +82,115 @@ class LogReader(QFileSystemWatcher):
         try:
             self._file_changed(changed_file)
         except FileNotFoundError:
-            print("File not found: %s; did it move?")
+            print("File not found: %s; did it move?" % changed_file)
+            self._close_reader(changed_file)
+
+    def _open_reader(self, changed_file):
+        reader = LogTail(changed_file)
+        reader.open()
+        self._readers[changed_file] = reader
+        current_end = reader.offset
+        login_offset = self._find_login(changed_file, current_end)
+        if login_offset is not None and changed_file != self._active:
+            # logged in before its log was first read, the lines read next will not
+            # hold the login, so switch to it here
+            self._set_active(changed_file)
+        if config.data['general']['catch_up'] and changed_file not in self._caught_up:
+            self._caught_up.add(changed_file)
+            self._catch_up(reader)
+            return reader
+        # start from the last login if it is within the final 1000 bytes,
+        # otherwise from where the file ended when reading started
+        if login_offset is None:
+            login_offset = self._start_offsets.get(changed_file, 0)
+        reader.seek(min(login_offset, current_end))
+        return reader
+
+    def _find_login(self, path, end):
+        """Returns the offset after the last login line in the last 1000 bytes before end."""
+        start = max(end - 1000, 0)
+        with open(path, 'rb') as log:
+            log.seek(start, os.SEEK_SET)
+            data = log.read(end - start)
+        index = data.rfind(LOGIN_MARKER + b'\r\n')
+        if index == -1:
+            return None
+        return start + index + len(LOGIN_MARKER) + 2
+
+    def _catch_up(self, reader):
+        """
+        Replay the recent part of a log file through the backlog signal, up to where it
+        ended when reading started. The lines after that are live and read as usual.
+        """
+        horizon = datetime.datetime.now() - datetime.timedelta(
+            minutes=config.data['general']['catch_up_minutes'])
+        current_end = min(self._start_offsets.get(reader.path, 0), reader.offset)
+        reader.seek(find_catch_up_offset(
+            reader.path, horizon, config.data['general']['catch_up_to_login']))
+        if reader.offset >= current_end:
+            reader.seek(current_end)
+            return
+        print("Catching up on %d bytes of '%s'..." % (
+            current_end - reader.offset, reader.path))
+        while reader.offset < current_end:
+            lines = reader.read_lines(min(CATCH_UP_BLOCK, current_end - reader.offset))
+            if lines:
+                batch = stamp_lines(lines, True, reader.char_name, reader.server)
+                batch.backlog = True
+                self.backlog_lines.emit(batch)
+
+    def _close_reader(self, path):
+        reader = self._readers.pop(path, None)
+        if reader:
+            reader.close()
+        if path == self._active:
+            self._active = ''
+
+    def _set_active(self, path):
+        self._active = path
+        config.char_name = parse_log_file_name(path)[0]
+        if not config.data['sharing']['player_name_override']:
+            config.data['sharing']['player_name'] = config.char_name
+            location_service.SIGNALS.config_updated.emit()
+        self.active_changed.emit(config.char_name)
 
     def _file_changed(self, changed_file):
-        if changed_file != self._stats['log_file']:
-            self._stats['log_file'] = changed_file
-            config.char_name = os.path.basename(changed_file).split("_")[1]
-            if not config.data['sharing']['player_name_override']:
-                config.data['sharing']['player_name'] = config.char_name
-                location_service.SIGNALS.config_updated.emit()
-            with open(self._stats['log_file'], 'rb') as log:
-                log.seek(0, os.SEEK_END)
-                current_end = log.tell()
-                log.seek(max(log.tell() - 1000, 0), os.SEEK_SET)
-                for line in log:
-                    if line.endswith(b'] Welcome to EverQuest!\r\n'):
-                        break
-                self._stats['last_read'] = min(log.tell(), current_end)
-
-        with open(self._stats['log_file']) as log:
-            try:
-                log.seek(self._stats['last_read'], os.SEEK_SET)
-                lines = log.readlines()
-                self._stats['last_read'] = log.tell()
-                for line in lines:
-                    self.new_line.emit((
-                        datetime.datetime.now(),
-                        strip_timestamp(line)
-                        ))
-            except Exception:  # do not read lines if they cause errors
-                log.seek(0, os.SEEK_END)
-                self._stats['last_read'] = log.tell()
+        reader = self._readers.get(changed_file)
+        if not reader:
+            if not self._active:
+                # the active character has to be known before any catch-up replay
+                self._set_active(changed_file)
+            reader = self._open_reader(changed_file)
+
+        try:
+            lines = reader.read_lines()
+            if not lines:
+                return
+            reader.last_activity = datetime.datetime.now()
+            # another character writing to its log (e.g. a boxed one) does not take over,
+            # the active character only changes when one logs in
+            if changed_file != self._active and (not self._active or any(
+                    line.endswith(LOGIN_TEXT) for line in lines)):
+                self._set_active(changed_file)
+            batch = stamp_lines(
+                lines, config.data['general']['use_log_timestamps'], reader.char_name, reader.server)
+            self.new_lines.emit(batch)
+            if self.receivers(self.new_line):
+                for new_line in batch:
+                    self.new_line.emit(new_line)
+        except FileNotFoundError:
+            raise
+        except Exception:  # do not read lines if they cause errors
+            reader.seek_end()
+
+    def stop(self):
+        """Release all open log file handles and the watcher backend."""
+        for path in list(self._readers):
+            self._close_reader(path)
+        if self._notifier:
+            self._notifier.setEnabled(False)
+        if self._poll_timer:
+            self._poll_timer.stop()
+        if self._backend:
+            self._backend.close()
+            self._backend = None
@@ -0,0 +1,246 @@
+"""
+Incremental, persistent-handle reader for a single Everquest log file.
+"""
+import datetime
+import os
+
+from helpers import parse_timestamp, strip_timestamp
+
+# size of the reusable read buffer, appended data larger than this is read in several passes
+READ_CHUNK = 64 * 1024
+
+# Everquest logs are written in the local windows codepage, never fail a line because of it
+LOG_ENCODING = 'cp1252'
+
+# block size used when scanning backwards for the start of a catch-up replay
+CATCH_UP_BLOCK = 1024 * 1024
+LOGIN_MARKER = b'] Welcome to EverQuest!'
+
+
+def parse_log_file_name(path):
+    """Returns (character name, server) from an 'eqlog_<name>_<server>.txt' path."""
+    parts = os.path.splitext(os.path.basename(path))[0].split('_')
+    char_name = parts[1] if len(parts) > 1 else ''
+    server = parts[2] if len(parts) > 2 else ''
+    return char_name, server
+
+
+class LogLines(list):
+    """
+    A list of (datetime, text) read from one log file, tagged with the character
+    and server of that file, and whether the lines are backlog replayed on catch-up
+    rather than new.  Slices keep the tags.
+    """
+
+    def __init__(self, lines=(), char_name='', server='', backlog=False):
+        super().__init__(lines)
+        self.char_name = char_name
+        self.server = server
+        self.backlog = backlog
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return LogLines(
+                super().__getitem__(index), self.char_name, self.server, self.backlog)
+        return super().__getitem__(index)
+
+
+def stamp_lines(lines, use_log_timestamps=True, char_name='', server=''):
+    """
+    Returns LogLines [(datetime, text), ...] for raw log lines.
+
+    Args:
+        lines: raw log lines, including their '[...]' timestamp prefix
+        use_log_timestamps: use each line's own timestamp, the current time is used
+            for lines without a valid one or when this is not set
+    """
+    now = datetime.datetime.now()
+    batch = LogLines(char_name=char_name, server=server)
+    if use_log_timestamps:
+        for line in lines:
+            timestamp = parse_timestamp(line)
+            if timestamp:
+                batch.append((timestamp, line[26:].strip()))
+            else:
+                batch.append((now, strip_timestamp(line)))
+    else:
+        batch.extend((now, strip_timestamp(line)) for line in lines)
+    return batch
+
+
+class LogTail:
+    """
+    Keeps one binary handle open on a log file and returns only the complete lines
+    appended since the previous read.
+
+    A trailing line without its line terminator is held back until the rest of it
+    has been written.  Truncation (size smaller than the current offset) and
+    rotation (a different file now living at the same path) are detected with
+    os.stat() and reading restarts from the beginning of the new file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offset = 0
+        self.char_name, self.server = parse_log_file_name(path)
+        self.last_activity = None  # datetime of the last read that returned lines
+        self._handle = None
+        self._inode = None
+        self._partial = b''
+        self._skip_partial = False  # offset is in the middle of a line
+        self._buffer = bytearray(READ_CHUNK)
+        self._view = memoryview(self._buffer)
+
+    def open(self, offset=None):
+        """
+        Open the file and position the reader.
+
+        Args:
+            offset: byte offset to start reading from, None means end of file
+        """
+        self.close()
+        self._handle = open(self.path, 'rb', buffering=0)
+        self._inode = os.fstat(self._handle.fileno()).st_ino
+        if offset is None:
+            offset = self._handle.seek(0, os.SEEK_END)
+        self.seek(offset)
+
+    def seek(self, offset):
+        """
+        Move the reader to offset, dropping any held back partial line.  If offset is in
+        the middle of a line, the rest of that line is skipped.
+        """
+        self._partial = b''
+        self._skip_partial = False
+        if offset > 0:
+            self._handle.seek(offset - 1, os.SEEK_SET)
+            self._skip_partial = self._handle.read(1) not in (b'\n', b'')
+        self.offset = self._handle.seek(offset, os.SEEK_SET)
+
+    def seek_end(self):
+        """Skip everything currently in the file."""
+        self.seek(os.fstat(self._handle.fileno()).st_size)
+
+    def close(self):
+        if self._handle:
+            self._handle.close()
+        self._handle = None
+        self._inode = None
+        self._partial = b''
+
+    @property
+    def is_open(self):
+        return self._handle is not None
+
+    def _check_replaced(self):
+        """Reopen the path if the file was rotated or truncated underneath us."""
+        stat = os.stat(self.path)
+        if stat.st_ino != self._inode:
+            print("Log file '%s' was replaced, reading from start..." % self.path)
+            self.open(0)
+        elif stat.st_size < self.offset:
+            print("Log file '%s' was truncated, reading from start..." % self.path)
+            self.seek(0)
+
+    def read_chunks(self, max_bytes=None):
+        """
+        Returns the raw bytes appended since the last read.
+
+        Args:
+            max_bytes: stop after this many bytes, None reads everything available
+        """
+        if not self._handle:
+            self.open()
+        self._check_replaced()
+        chunks = []
+        total = 0
+        while True:
+            size = min(READ_CHUNK, max_bytes - total) if max_bytes else READ_CHUNK
+            count = self._handle.readinto(self._view[:size])
+            if not count:
+                break
+            chunks.append(bytes(self._view[:count]))
+            self.offset += count
+            total += count
+            if count < size or (max_bytes and total >= max_bytes):
+                break
+        return b''.join(chunks)
+
+    def read_lines(self, max_bytes=None):
+        """
+        Returns a list of the complete lines appended since the last read, decoded
+        and without line terminators.
+        """
+        data = self.read_chunks(max_bytes)
+        if not data:
+            return []
+        if self._skip_partial:
+            end_of_line = data.find(b'\n')
+            if end_of_line == -1:
+                return []
+            self._skip_partial = False
+            data = data[end_of_line + 1:]
+        if self._partial:
+            data = self._partial + data
+        lines = data.split(b'\n')
+        self._partial = lines.pop()
+        return [line.rstrip(b'\r').decode(LOG_ENCODING, 'replace') for line in lines]
+
+
+def _block_timestamp(line):
+    return parse_timestamp(line[:26].decode('ascii', 'replace'))
+
+
+def find_catch_up_offset(path, horizon, stop_at_login=True):
+    """
+    Returns the byte offset of the first line worth replaying from path.
+
+    The file is scanned backwards in CATCH_UP_BLOCK sized blocks until a line older
+    than horizon is found, or, with stop_at_login, the most recent login message, so
+    the cost is proportional to the replayed span rather than the size of the log.
+
+    Args:
+        path: log file to scan
+        horizon: datetime, lines stamped before this are not replayed
+        stop_at_login: replay only from the line after the most recent login message
+    """
+    with open(path, 'rb') as log:
+        position = log.seek(0, os.SEEK_END)
+        carry = b''  # head of the line straddling the previous block boundary
+        while position > 0:
+            block_start = max(position - CATCH_UP_BLOCK, 0)
+            log.seek(block_start, os.SEEK_SET)
+            data = log.read(position - block_start) + carry
+            position = base = block_start
+            if block_start > 0:
+                # the first line of the block is only complete once the block before it is read
+                cut = data.find(b'\n') + 1
+                if not cut:
+                    carry = data
+                    continue
+                carry, data = data[:cut], data[cut:]
+                base += cut
+
+            login_offset = None
+            if stop_at_login:
+                index = data.rfind(LOGIN_MARKER)
+                if index != -1:
+                    end_of_line = data.find(b'\n', index)
+                    login_offset = base + (end_of_line + 1 if end_of_line != -1 else len(data))
+
+            offset = base
+            crossed = False
+            for line in data.split(b'\n'):
+                timestamp = _block_timestamp(line)
+                if timestamp is not None:
+                    if timestamp >= horizon:
+                        break
+                    crossed = True
+                offset += len(line) + 1
+            offset = min(offset, base + len(data))
+
+            if crossed:
+                return max(offset, login_offset or 0)
+            if login_offset is not None:
+                return login_offset
+    return 0
@@ -0,0 +1,102 @@
+"""
+Offline log replay: `nparse replay <logfile>` streams an Everquest log through the
+parsing cores of the Maps, Spells and DeathLoopVaccine windows (see parsers.trackers),
+dispatched like the application does, and reports throughput, per-parser time share
+and peak memory.
+"""
+import argparse
+import os
+import sys
+import time
+
+from helpers import config
+
+
+def peak_memory():
+    """Returns the peak resident memory of this process in bytes, or None if unknown."""
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # linux reports kilobytes, macos bytes
+        return peak if sys.platform == 'darwin' else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss)
+    except Exception:
+        return None
+
+
+def _format_value(value):
+    if isinstance(value, (list, tuple)):
+        return ','.join(str(_format_value(item)) for item in value)
+    return getattr(value, 'name', value)
+
+
+def format_event(event):
+    """Returns a one line, diffable description of a tracker Event."""
+    values = ' '.join(
+        '{}={}'.format(key, _format_value(value))
+        for key, value in sorted(event.data.items())
+    )
+    return '[{}] {} {}'.format(
+        event.timestamp.strftime('%a %b %d %H:%M:%S %Y'), event.name, values).rstrip()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='nparse replay',
+        description='Replay an Everquest log through the nParse parsers.')
+    parser.add_argument('logfile', help='eqlog_<name>_<server>.txt to replay')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='replay at this multiple of real time (default: as fast as possible)')
+    parser.add_argument('--config', default='nparse.config.json',
+                        help='nParse settings to parse with (default: %(default)s)')
+    parser.add_argument('--events', action='store_true',
+                        help='print every parser event, e.g. to diff two runs')
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.logfile):
+        parser.error('log file not found: %s' % args.logfile)
+
+    config.load(args.config)
+    config.verify_settings()
+
+    # imported late so the settings above are in place when the spell book loads
+    from helpers.engine import Engine
+    from parsers.trackers import create_trackers
+
+    load_start = time.perf_counter()
+    engine = Engine(create_trackers())
+    load_time = time.perf_counter() - load_start
+    engine.enable_profiling()
+    events = {}
+
+    def count_event(event):
+        events[event.name] = events.get(event.name, 0) + 1
+        if args.events:
+            print(format_event(event))
+
+    engine.subscribe(count_event)
+
+    start = time.perf_counter()
+    lines = engine.replay(args.logfile, speed=args.speed)
+    elapsed = time.perf_counter() - start
+
+    parse_time = sum(engine.timings.values()) or 1.0
+    size = os.path.getsize(args.logfile)
+    print('replayed {:,} lines ({:,.1f} MB) in {:.2f}s: {:,.0f} lines/sec'.format(
+        lines, size / 1024 / 1024, elapsed, lines / elapsed if elapsed else 0))
+    print('setup (spell book, trackers): {:.2f}s'.format(load_time))
+    print('parser time share:')
+    for name, seconds in sorted(engine.timings.items(), key=lambda x: -x[1]):
+        print('  {:<20} {:>8.3f}s {:>6.1%}'.format(name, seconds, seconds / parse_time))
+    print('events:')
+    for name, count in sorted(events.items()):
+        print('  {:<20} {:>8,}'.format(name, count))
+    peak = peak_memory()
+    if peak:
+        print('peak memory: {:,.1f} MB'.format(peak / 1024 / 1024))
+    return 0
@@ -10,9 +10,19 @@ from PyQt6.QtGui import QColor
 
 from helpers import config, text_time_to_seconds
 from helpers import location_service
-from parsers.spells import CustomTrigger
+from parsers.spellbook import CustomTrigger
 
 
+WHATS_THIS_LOG_TIMESTAMPS = """Stamp each log line with the time Everquest wrote it instead of the time nParse read it.
+This keeps spell timers and other time windows correct when nParse falls behind or catches up on older lines.  Lines
+without a valid timestamp fall back to the current time.
+""".replace('\n', ' ')
+
+WHATS_THIS_CATCH_UP = """When nParse starts reading a log file, replay the most recent part of it so buff timers and
+recent deaths survive a restart.  Only the replay window is read, scanning backwards from the end of the file, and
+replay can stop early at the last login message.
+""".replace('\n', ' ')
+
 WHATS_THIS_CASTING_WINDOW = """The Casting Window is a range of time in which the spell you are casting will land.
 nParse limits parsing successful casts for the spell to only within that window.  This disables nParse from using other's
 successful casts as yours.  It will also enable the ability to parse Group, Bard, and AOE spells.  The size of the buffer
@@ -36,6 +46,10 @@ you by other players. WARNING: This option is very buggy. Use it at your own ris
 spell durations at all costs. There will be other strange behavior.
 """.replace('\n', ' ')
 
+WHATS_THIS_LIST_VIEW = """Draw the spell timers as one painted list rather than a set of widgets per spell.  This is
+much lighter when tracking a lot of targets, e.g. buffing a whole raid.  Takes effect when nParse is restarted.
+""".replace('\n', ' ')
+
 WHATS_THIS_SHARING = """Your location can be shared with others via a central location server. If you enable this, you
 agree to send and receive location data via a third-party server. The only data other players can see is your character
 name and the zone+loc you send. Nothing personally identifiable will be visible beyond this.
@@ -183,6 +197,24 @@ class SettingsWindow(QDialog):
         gsl_update_check = QCheckBox()
         gsl_update_check.setObjectName('general:update_check')
         gsl.addRow('Check for Updates', gsl_update_check)
+        gsl_log_timestamps = QCheckBox()
+        gsl_log_timestamps.setWhatsThis(WHATS_THIS_LOG_TIMESTAMPS)
+        gsl_log_timestamps.setObjectName('general:use_log_timestamps')
+        gsl.addRow('Use Log Timestamps', gsl_log_timestamps)
+        gsl.addRow(SettingsHeader('catch up'))
+        gsl_catch_up = QCheckBox()
+        gsl_catch_up.setWhatsThis(WHATS_THIS_CATCH_UP)
+        gsl_catch_up.setObjectName('general:catch_up')
+        gsl.addRow('Replay Recent Log on Start', gsl_catch_up)
+        gsl_catch_up_minutes = QSpinBox()
+        gsl_catch_up_minutes.setRange(1, 1440)
+        gsl_catch_up_minutes.setSingleStep(5)
+        gsl_catch_up_minutes.setSuffix(' min')
+        gsl_catch_up_minutes.setObjectName('general:catch_up_minutes')
+        gsl.addRow('Replay Window', gsl_catch_up_minutes)
+        gsl_catch_up_to_login = QCheckBox()
+        gsl_catch_up_to_login.setObjectName('general:catch_up_to_login')
+        gsl.addRow('Stop at Last Login', gsl_catch_up_to_login)
         gsl.addRow(SettingsHeader('parsers'))
         gsl_scaling = QSpinBox()
         gsl_scaling.setRange(100, 300)
@@ -215,6 +247,10 @@ class SettingsWindow(QDialog):
             'Casting Window Buffer (msec 1-4000)',
             ssl_casting_window_buffer
             )
+        ssl_list_view = QCheckBox()
+        ssl_list_view.setWhatsThis(WHATS_THIS_LIST_VIEW)
+        ssl_list_view.setObjectName('spells:use_list_view')
+        ssl.addRow('Compact List View', ssl_list_view)
         ssl_open_custom = QPushButton("Edit")
         ssl_open_custom.clicked.connect(self._get_custom_timers)
         ssl.addRow('Custom Timers', ssl_open_custom)
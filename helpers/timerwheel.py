@@ -0,0 +1,114 @@
+"""
+Shared one second tick for every countdown on screen.
+
+Instead of each spell widget and spawn point re-arming its own QTimer every second, they
+register with the timer wheel: tick callbacks are called together once per second, and
+expiry callbacks scheduled with call_at sit in a hashed wheel of one second slots until due.
+The underlying QTimer only runs while something is registered.
+"""
+import time
+
+from PyQt6.QtCore import QObject, Qt, QTimer
+
+TICK_MSEC = 1000
+WHEEL_SLOTS = 64  # seconds, later expiries wait in their slot for more turns
+
+_WHEEL = None
+
+
+def get_timer_wheel():
+    global _WHEEL
+    if _WHEEL is None:
+        _WHEEL = TimerWheel()
+    return _WHEEL
+
+
+class TimerWheel(QObject):
+
+    def __init__(self):
+        super().__init__()
+        self._tick_callbacks = {}  # callback: None, an ordered set
+        self._slots = [[] for _ in range(WHEEL_SLOTS)]  # [[due timestamp, callback]]
+        self._scheduled = 0
+        self._second = None  # last second the wheel turned to
+        self._timer = QTimer()
+        self._timer.setTimerType(Qt.TimerType.CoarseTimer)
+        self._timer.setInterval(TICK_MSEC)
+        self._timer.timeout.connect(self._tick)
+
+    def add(self, callback):
+        """Call callback() once every tick until removed."""
+        self._tick_callbacks[callback] = None
+        self._start()
+
+    def remove(self, callback):
+        self._tick_callbacks.pop(callback, None)
+        self._stop_if_idle()
+
+    def call_at(self, when, callback):
+        """
+        Call callback() on the first tick at or after when, a naive datetime in local time.
+
+        Returns:
+            handle to pass to cancel
+        """
+        due = when.timestamp()
+        entry = [due, callback]
+        # the next tick only turns over the slots from the current second on, so
+        # anything already due goes in the current one
+        current = self._second if self._timer.isActive() else int(time.time())
+        self._slots[max(int(due), current) % WHEEL_SLOTS].append(entry)
+        self._scheduled += 1
+        self._start()
+        return entry
+
+    def cancel(self, handle):
+        if handle and handle[1] is not None:
+            handle[1] = None
+            self._scheduled -= 1
+            self._stop_if_idle()
+
+    def _start(self):
+        if not self._timer.isActive():
+            self._second = int(time.time())
+            self._timer.start()
+
+    def _stop_if_idle(self):
+        if not self._tick_callbacks and not self._scheduled:
+            self._timer.stop()
+
+    def _tick(self):
+        now = time.time()
+        second = int(now)
+        # catch up on every slot passed since the last turn, e.g. after the machine slept,
+        # starting with the last one again since it may hold expiries later in that second
+        first = self._second if self._second is not None else second
+        if second - first >= WHEEL_SLOTS:
+            first = second - WHEEL_SLOTS + 1
+        self._second = second
+        for slot in range(first, second + 1):
+            self._expire(self._slots[slot % WHEEL_SLOTS], now)
+
+        for callback in list(self._tick_callbacks):
+            self._call(callback)
+        self._stop_if_idle()
+
+    def _expire(self, slot, now):
+        due = [entry for entry in slot if entry[1] is None or entry[0] <= now]
+        if not due:
+            return
+        slot[:] = [entry for entry in slot if entry[1] is not None and entry[0] > now]
+        for entry in due:
+            callback, entry[1] = entry[1], None
+            if callback is not None:
+                self._scheduled -= 1
+                self._call(callback)
+
+    def _call(self, callback):
+        try:
+            callback()
+        except RuntimeError as error:
+            # the Qt object behind callback was deleted without unregistering
+            if 'deleted' not in str(error):
+                raise
+            self._tick_callbacks.pop(callback, None)
@@ -0,0 +1,248 @@
+"""
+Trigger registry: parsers register the line prefixes, suffixes and regexes they react to,
+and each log line is matched once against all of them instead of by every parser in turn.
+"""
+import re
+
+# flags a regex may carry and still be folded into the combined regex
+_COMBINABLE_FLAGS = re.UNICODE | re.IGNORECASE
+# inline global flags, e.g. (?i), only allowed at the start of a regex
+_GLOBAL_FLAGS = re.compile(r'\(\?[aiLmsux]+\)')
+# characters ending the literal start of a regex, quantifiers also take back the
+# character before them
+_REGEX_SPECIAL = set('.^$*+?{}[]\\|()')
+_QUANTIFIERS = set('*+?{')
+
+
+class PrefixTrie:
+    """
+    Character trie returning the values of every key that is a prefix of a text,
+    or with reverse=True, of every key that is a suffix of it.
+    """
+
+    def __init__(self, reverse=False):
+        self.reverse = reverse
+        self._root = {}  # char: node, '' holds the values of the key ending at a node
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key, value):
+        if not key:
+            raise ValueError('trie keys can not be empty')
+        node = self._root
+        for char in reversed(key) if self.reverse else key:
+            node = node.setdefault(char, {})
+        node.setdefault('', []).append(value)
+        self._size += 1
+
+    def matches(self, text):
+        """Returns the values of matching keys, shortest key first."""
+        found = []
+        node = self._root
+        for char in reversed(text) if self.reverse else text:
+            node = node.get(char)
+            if node is None:
+                break
+            values = node.get('')
+            if values:
+                found.extend(values)
+        return found
+
+
+class TriggerRegistry:
+    """
+    Dispatches log lines to the handlers registered for them.
+
+    Handlers are called in the order they were registered:
+        text, prefix and suffix handlers as handler(timestamp, text), text handlers for
+            lines that are exactly the text
+        regex handlers as handler(timestamp, text, match), regexes match at the start of the line
+        line handlers, for every line, as handler(timestamp, text)
+    A handler registered for several triggers matching a line is called once, for the first.
+
+    Regexes starting with literal text are only tried on lines starting with it, found
+    in the same kind of trie as the prefixes. The others are tested in one combined match.
+    """
+
+    def __init__(self):
+        self._triggers = []  # (kind, pattern, handler), index is the registration order
+        self._compiled = False
+        self._texts = {}  # text: [trigger index]
+        self._prefixes = None  # PrefixTrie of trigger index
+        self._suffixes = None  # reversed PrefixTrie of trigger index
+        self._regex_prefixes = None  # PrefixTrie of the index of regexes by their literal start
+        self._combined = None  # one regex testing every combinable regex at once
+        self._combined_groups = []  # (marker group, trigger index) in _combined
+        self._separate = []  # trigger index of regexes that could not be combined
+        self._line_handlers = []  # trigger index
+
+    def __len__(self):
+        return len(self._triggers)
+
+    def add_text(self, text, handler):
+        self._add('text', text, handler)
+
+    def add_prefix(self, prefix, handler):
+        self._add('prefix', prefix, handler)
+
+    def add_suffix(self, suffix, handler):
+        self._add('suffix', suffix, handler)
+
+    def add_regex(self, pattern, handler, flags=0):
+        """
+        pattern is a string or compiled regex, matched like re.match. Inline global
+        flags like (?i) have to be at its start, as python 3.11 requires.
+        """
+        if isinstance(pattern, str):
+            pattern = re.compile(pattern, flags)
+        self._add('regex', pattern, handler)
+
+    def add_line_handler(self, handler):
+        self._add('line', None, handler)
+
+    def clear(self):
+        self._triggers = []
+        self._compiled = False
+
+    def _add(self, kind, pattern, handler):
+        self._triggers.append((kind, pattern, handler))
+        self._compiled = False
+
+    def compile(self):
+        self._texts = {}
+        self._prefixes = PrefixTrie()
+        self._suffixes = PrefixTrie(reverse=True)
+        self._regex_prefixes = PrefixTrie()
+        self._line_handlers = []
+        self._separate = []
+        parts = []
+        self._combined_groups = []
+        groups = 0
+        for index, (kind, pattern, _) in enumerate(self._triggers):
+            if kind == 'text':
+                self._texts.setdefault(pattern, []).append(index)
+            elif kind == 'prefix':
+                self._prefixes.add(pattern, index)
+            elif kind == 'suffix':
+                self._suffixes.add(pattern, index)
+            elif kind == 'line':
+                self._line_handlers.append(index)
+            else:
+                # pattern.flags already holds a leading (?i), which may not be nested
+                # in the groups below
+                source = pattern.pattern[_global_flags_end(pattern.pattern):]
+                if (pattern.flags & ~_COMBINABLE_FLAGS or _has_back_reference(pattern) or
+                        _GLOBAL_FLAGS.search(source)):
+                    self._separate.append(index)
+                    continue
+                prefix = '' if pattern.flags & re.IGNORECASE else literal_prefix(source)
+                if prefix:
+                    self._regex_prefixes.add(prefix, index)
+                    continue
+                # (?=pattern)() succeeds with an empty marker group when pattern matches
+                # at the start of the line, the empty alternative when it does not
+                source = re.sub(r'\(\?P<\w+>', '(', source)
+                if pattern.flags & re.IGNORECASE:
+                    source = '(?i:{})'.format(source)
+                parts.append('(?:(?=(?:{}))()|)'.format(source))
+                groups += pattern.groups + 1
+                self._combined_groups.append((groups, index))
+        self._combined = re.compile(''.join(parts)) if parts else None
+        self._compiled = True
+
+    def matches(self, text):
+        """Returns the (index, match) of every trigger matching text, in registration order."""
+        if not self._compiled:
+            self.compile()
+        found = [(index, None) for index in self._prefixes.matches(text)]
+        if text in self._texts:
+            found.extend((index, None) for index in self._texts[text])
+        if self._suffixes:
+            found.extend((index, None) for index in self._suffixes.matches(text))
+        for index in self._regex_prefixes.matches(text):
+            match = self._triggers[index][1].match(text)
+            if match:
+                found.append((index, match))
+        if self._combined:
+            markers = self._combined.match(text)
+            for group, index in self._combined_groups:
+                if markers.group(group) is not None:
+                    # the combined regex only tells which regexes match, their own
+                    # groups are numbered differently in it
+                    found.append((index, self._triggers[index][1].match(text)))
+        for index in self._separate:
+            match = self._triggers[index][1].match(text)
+            if match:
+                found.append((index, match))
+        found.extend((index, None) for index in self._line_handlers)
+        if len(found) > 1:
+            found.sort(key=lambda item: item[0])
+            # a handler registered for several triggers is called once per line
+            unique = []
+            handlers = set()
+            for index, match in found:
+                handler = self._triggers[index][2]
+                if handler not in handlers:
+                    handlers.add(handler)
+                    unique.append((index, match))
+            found = unique
+        return found
+
+    def dispatch(self, timestamp, text):
+        """Call the handlers of every trigger matching text."""
+        for index, match in self.matches(text):
+            handler = self._triggers[index][2]
+            if match is None:
+                handler(timestamp, text)
+            else:
+                handler(timestamp, text, match)
+
+
+def _has_back_reference(pattern):
+    # group numbers shift inside the combined regex, so back references would point elsewhere
+    return bool(re.search(r'\\[1-9]|\(\?P=', pattern.pattern))
+
+
+def _global_flags_end(source):
+    """Returns where the inline global flags at the start of regex source end."""
+    end = 0
+    flags = _GLOBAL_FLAGS.match(source)
+    while flags:
+        end = flags.end()
+        flags = _GLOBAL_FLAGS.match(source, end)
+    return end
+
+
+def _has_top_level_alternative(source):
+    depth = 0
+    in_class = escaped = False
+    for char in source:
+        if escaped:
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == '|' and not depth:
+            return True
+    return False
+
+
+def literal_prefix(source):
+    """The plain ascii characters every match of regex source starts with."""
+    if _has_top_level_alternative(source):
+        return ''  # a top level alternative may start with anything
+    for position, char in enumerate(source):
+        if char in _REGEX_SPECIAL or not char.isascii():
+            if char in _QUANTIFIERS:
+                position -= 1
+            return source[:max(position, 0)]
+    return source
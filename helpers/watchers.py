@@ -0,0 +1,222 @@
+"""
+Qt-free watchers reporting which Everquest log files in a directory have changed.
+"""
+import abc
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import sys
+import time
+
+LOG_PATTERN = 'eqlog*.txt'
+
+# inotify constants, see <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+_libc = None
+
+
+def _get_libc():
+    global _libc
+    if _libc is None:
+        _libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    return _libc
+
+
+def inotify_available():
+    """Returns true if the inotify api can be used on this system."""
+    if not sys.platform.startswith('linux'):
+        return False
+    try:
+        return hasattr(_get_libc(), 'inotify_init1')
+    except OSError:
+        return False
+
+
+class LogWatcher(abc.ABC):
+    """
+    Base class for log directory watchers.
+
+    poll() returns the paths of log files that were modified or created since the
+    previous call, without blocking.  Event based watchers expose a file descriptor
+    through fileno() which becomes readable when poll() has something to report,
+    polling watchers return None and suggest a delay through interval instead.
+    """
+
+    def __init__(self, directory, pattern=LOG_PATTERN):
+        self.directory = directory
+        self.pattern = pattern
+        self.interval = None  # seconds until the next poll() is worthwhile, None if event based
+
+    def fileno(self):
+        return None
+
+    @abc.abstractmethod
+    def poll(self):
+        """Returns a list of the paths of the log files changed since the last call."""
+
+    def wait(self, timeout=None):
+        """
+        Block until log files change or timeout seconds pass.
+
+        Returns:
+            list: paths of the changed log files
+        """
+        fd = self.fileno()
+        if fd is not None:
+            readable, _, _ = select.select([fd], [], [], timeout)
+            return self.poll() if readable else []
+        delay = self.interval if timeout is None else min(self.interval, timeout)
+        time.sleep(delay)
+        return self.poll()
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(LogWatcher):
+    """Linux watcher using a single inotify watch on the log directory."""
+
+    def __init__(self, directory, pattern=LOG_PATTERN):
+        super().__init__(directory, pattern)
+        libc = _get_libc()
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        wd = libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), IN_MODIFY | IN_CREATE | IN_MOVED_TO)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, 'inotify_add_watch failed', directory)
+
+    def fileno(self):
+        return self._fd
+
+    def poll(self):
+        changed = []
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            position = 0
+            while position < len(data):
+                _, _, _, length = _EVENT_HEADER.unpack_from(data, position)
+                position += _EVENT_HEADER.size
+                name = os.fsdecode(data[position:position + length].rstrip(b'\0'))
+                position += length
+                if fnmatch.fnmatch(name.lower(), self.pattern):
+                    path = os.path.join(self.directory, name)
+                    if path not in changed:
+                        changed.append(path)
+        return changed
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+        self._fd = None
+
+
+class PollingWatcher(LogWatcher):
+    """
+    Portable watcher comparing os.stat() of log files.
+
+    Only the log files written within RECENT_SECONDS are stat'ed on each poll, most
+    directories hold many logs of characters not being played.  The directory is
+    listed every RESCAN_INTERVAL seconds, which picks up new log files and idle ones
+    written to again.  The polling interval shrinks to MIN_INTERVAL while files are
+    changing and grows towards MAX_INTERVAL while they are idle.
+    """
+
+    MIN_INTERVAL = 0.1
+    MAX_INTERVAL = 2.0
+    BACKOFF = 1.5
+    RESCAN_INTERVAL = 10.0
+    RECENT_SECONDS = 300.0
+
+    def __init__(self, directory, pattern=LOG_PATTERN):
+        super().__init__(directory, pattern)
+        self.interval = self.MIN_INTERVAL
+        self._stats = {}  # path: (size, mtime_ns), of every log file
+        self._recent = {}  # path: time.monotonic() of the last change, of the polled log files
+        self._last_rescan = 0
+        self._rescan(report=False)
+
+    def _rescan(self, report=True):
+        """
+        List the directory for new log files and idle ones that changed, returning
+        them as changed if report is set.
+        """
+        now = time.monotonic()
+        self._last_rescan = now
+        recent_ns = time.time_ns() - int(self.RECENT_SECONDS * 1e9)
+        changed = []
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.path in self._recent or not fnmatch.fnmatch(entry.name.lower(), self.pattern):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                current = (stat.st_size, stat.st_mtime_ns)
+                previous = self._stats.get(entry.path)
+                self._stats[entry.path] = current
+                if previous is None and not report:
+                    if stat.st_mtime_ns >= recent_ns:
+                        self._recent[entry.path] = now
+                elif current != previous:
+                    self._recent[entry.path] = now
+                    changed.append(entry.path)
+        return changed if report else []
+
+    def poll(self):
+        now = time.monotonic()
+        changed = []
+        for path, last_change in list(self._recent.items()):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                del self._recent[path]
+                self._stats.pop(path, None)
+                continue
+            current = (stat.st_size, stat.st_mtime_ns)
+            if current != self._stats.get(path):
+                self._stats[path] = current
+                self._recent[path] = now
+                changed.append(path)
+            elif now - last_change > self.RECENT_SECONDS:
+                del self._recent[path]
+        if now - self._last_rescan >= self.RESCAN_INTERVAL:
+            changed.extend(self._rescan())
+
+        if changed:
+            self.interval = self.MIN_INTERVAL
+        else:
+            self.interval = min(self.interval * self.BACKOFF, self.MAX_INTERVAL)
+        return changed
+
+
+def create_watcher(directory, backend='auto'):
+    """
+    Returns a LogWatcher for directory.
+
+    Args:
+        directory: Everquest logs directory
+        backend: 'inotify', 'polling' or 'auto' to prefer inotify where available
+    """
+    if backend in ('auto', 'inotify') and inotify_available():
+        try:
+            return InotifyWatcher(directory)
+        except OSError as error:
+            print("Unable to watch '%s' with inotify (%s), polling instead." % (directory, error))
+    return PollingWatcher(directory)
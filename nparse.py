@@ -1,16 +1,26 @@
 """NomnsParse: Parsing tools for Project 1999."""
 import os
+import re
 import sys
 import webbrowser
 
+if sys.version_info < (3, 10):
+    sys.exit('nParse needs Python 3.10 or newer')
+
+if __name__ == "__main__" and sys.argv[1:2] == ['replay']:
+    # headless log replay, runs without Qt
+    from helpers.replay import main
+    sys.exit(main(sys.argv[2:]))
+
 from PyQt6.QtCore import Qt
 from PyQt6.QtGui import QCursor, QFontDatabase, QIcon
 from PyQt6.QtWidgets import (QApplication, QFileDialog, QMenu, QMessageBox,
                              QSystemTrayIcon)
 
 import parsers
-from helpers import config, logreader, resource_path, get_version, location_service
+from helpers import Parser, config, logreader, resource_path, get_version, location_service
 from helpers.settings import SettingsWindow
+from helpers.triggers import TriggerRegistry
 
 try:
     import pyi_splash  # noqa
@@ -90,6 +100,27 @@ class NomnsParse(QApplication):
             if config.data[parser.name]['toggled']:
                 parser.toggle()
 
+        # toggle_<name> and toggle_clickthrough_<name> commands typed in game
+        self._command_matcher = re.compile(r'toggle_(clickthrough_)?({})'.format(
+            '|'.join(re.escape(parser.name) for parser in self._parsers)))
+        self._active_parsers = []
+        self._active_triggers = TriggerRegistry()  # triggers of all _active_parsers
+        self._active_generation = None  # Parser.toggle_generation of _active_parsers
+
+    def _get_active_parsers(self):
+        """Returns the parsers receiving lines, rebuilt only after a parser was toggled."""
+        if self._active_generation != Parser.toggle_generation:
+            #  don't send parse to non toggled items, except maps.  always parse maps
+            self._active_parsers = [
+                parser for parser in self._parsers
+                if config.data[parser.name]['toggled'] or parser.name == 'maps'
+            ]
+            self._active_triggers.clear()
+            for parser in self._active_parsers:
+                parser.register_triggers(self._active_triggers)
+            self._active_generation = Parser.toggle_generation
+        return self._active_parsers
+
     def _toggle(self):
         if not self._toggled:
             try:
@@ -101,10 +132,12 @@ class NomnsParse(QApplication):
             else:
                 self._log_reader = logreader.LogReader(
                     config.data['general']['eq_log_dir'])
-                self._log_reader.new_line.connect(self._parse)
+                self._log_reader.new_lines.connect(self._parse_batch)
+                self._log_reader.backlog_lines.connect(self._replay_backlog)
                 self._toggled = True
         else:
             if self._log_reader:
+                self._log_reader.stop()
                 self._log_reader.deleteLater()
                 self._log_reader = None
             location_service.stop_location_service()
@@ -115,19 +148,56 @@ class NomnsParse(QApplication):
                     print("Failed to shutdown parser: %s" % parser.name)
             self._toggled = False
 
+    def _parse_batch(self, new_lines):
+        # toggle commands change which parsers receive the lines after them,
+        # so hand out the batch in runs split at each command
+        start = 0
+        for index, (_, text) in enumerate(new_lines):
+            if text[:7] == 'toggle_':
+                self._dispatch(new_lines[start:index])
+                self._parse(new_lines[index])
+                start = index + 1
+        self._dispatch(new_lines[start:])
+
+    def _replay_backlog(self, lines):
+        # backlog restores state only, toggle commands in it were handled back then
+        Parser.replaying = lines.backlog
+        try:
+            self._dispatch(lines)
+        finally:
+            Parser.replaying = False
+
+    def _dispatch(self, lines):
+        if not lines:
+            return
+        parsers = self._get_active_parsers()
+        if lines.char_name == config.char_name:
+            # match each line once against the triggers of every active parser
+            dispatch = self._active_triggers.dispatch
+            for timestamp, text in lines:
+                dispatch(timestamp, text)
+        else:
+            for parser in parsers:
+                if parser.follow_all_characters:
+                    parser.parse_batch(lines)
+
     def _parse(self, new_line):
         if new_line:
             timestamp, text = new_line  # (datetime, text)
-            #  don't send parse to non toggled items, except maps.  always parse maps
-            for parser in self._parsers:
-                if text.startswith('toggle_clickthrough_%s' % parser.name):
-                    config.data[parser.name]['clickthrough'] = (
-                        not config.data[parser.name]['clickthrough'])
+            command = None
+            if text[:7] == 'toggle_':
+                command = self._command_matcher.match(text)
+            if command:
+                target = self._parsers_dict[command.group(2)]
+                if command.group(1):
+                    config.data[target.name]['clickthrough'] = (
+                        not config.data[target.name]['clickthrough'])
                     config.save()
-                    parser.set_flags()
-                elif text.startswith('toggle_%s' % parser.name):
-                    parser.toggle()
-                elif config.data[parser.name]['toggled'] or parser.name == 'maps':
+                    target.set_flags()
+                else:
+                    target.toggle()
+            for parser in self._get_active_parsers():
+                if not command or parser is not target:
                     parser.parse(timestamp, text)
 
     def _menu(self, event):
@@ -1,5 +1,15 @@
+import importlib
 
-from .maps import Maps  # noqa: F401
-from .spells import Spells  # noqa: F401
-from .discord import Discord  # noqa: F401
-from .deathloopvaccine import DeathLoopVaccine # noqa: F401
+# the window parsers pull in Qt, import them on first use so the parsing core can run headless
+_PARSERS = {
+    'Maps': '.maps',
+    'Spells': '.spells',
+    'Discord': '.discord',
+    'DeathLoopVaccine': '.deathloopvaccine',
+}
+
+
+def __getattr__(name):
+    if name in _PARSERS:
+        return getattr(importlib.import_module(_PARSERS[name], __name__), name)
+    raise AttributeError("module '%s' has no attribute '%s'" % (__name__, name))
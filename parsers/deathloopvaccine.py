@@ -5,7 +5,8 @@ import signal
 
 
 from datetime import datetime
-from helpers import Parser, config, get_eqgame_pid_list, starprint
+from helpers import Parser, config, get_eqgame_pid_list, parse_timestamp, starprint
+from helpers.triggers import TriggerRegistry
 
 
 #
@@ -58,6 +59,10 @@ class DeathLoopVaccine(Parser):
         # flag indicating whether the "process killer" gun is armed
         self._kill_armed = True
 
+        # the log lines this parser reacts to
+        self._triggers = TriggerRegistry()
+        self.register_triggers(self._triggers)
+
     def reset(self) -> None:
         """
         Utility function to clear the death_list and reset the armed flag
@@ -68,6 +73,37 @@ class DeathLoopVaccine(Parser):
         self._death_list.clear()
         self._kill_armed = True
 
+    def register_triggers(self, registry: TriggerRegistry) -> None:
+        """
+        Register the log lines this parser reacts to
+
+        Args:
+            registry: the TriggerRegistry dispatching the log lines
+
+        Returns:
+            None:
+        """
+
+        # death messages
+        registry.add_prefix('You have been slain', self.check_for_death)
+
+        # a way to test - send a tell to death_loop
+        registry.add_prefix('death_loop', self.check_for_simulated_death)
+
+        # proof of life - casting
+        registry.add_prefix('You begin casting', self.check_not_afk)
+
+        # proof of life - communication
+        # this captures tells, say, group, auction, and shout channels
+        for prefix in ('You told', 'You say', 'You tell', 'You auction', 'You shout'):
+            registry.add_prefix(prefix, self.check_not_afk)
+        registry.add_regex(r'(\S+) ->', self.check_own_tell)
+
+        # proof of life - melee
+        registry.add_regex(
+            r'You( try to)? (hit|slash|pierce|crush|claw|bite|sting|maul|gore|punch|kick|backstab|bash|slice)',
+            self.check_not_afk_melee)
+
     # main parsing logic here
     def parse(self, timestamp: datetime, text: str) -> None:
         """
@@ -81,14 +117,11 @@ class DeathLoopVaccine(Parser):
             None:
         """
 
-        self.check_for_death(timestamp, text)
-        self.check_not_afk(timestamp, text)
-        self.deathloop_response()
+        self._triggers.dispatch(timestamp, text)
 
     def check_for_death(self, timestamp: datetime, text: str) -> None:
         """
-        check for indications the player just died, and if we find it,
-        save the message for later processing
+        the player just died, save the message for later processing
 
         Args:
             timestamp: A datetime.datetime object, created from the timestamp text of the raw logfile line
@@ -98,57 +131,63 @@ class DeathLoopVaccine(Parser):
             None:
         """
 
-        trunc_line = text
+        # add this message to the list of death messages
         line = f'[{timestamp.strftime("%a %b %d %H:%M:%S %Y")}] ' + text
+        self._death_list.append(line)
+        starprint(f'DeathLoopVaccine:  Death count = {len(self._death_list)}')
 
-        # does this line contain a death message
-        slain_regexp = r'^You have been slain'
-        m = re.match(slain_regexp, trunc_line)
-        if m:
-            # add this message to the list of death messages
-            self._death_list.append(line)
-            starprint(f'DeathLoopVaccine:  Death count = {len(self._death_list)}')
+        self.purge_old_deaths(timestamp)
+        self.deathloop_response()
 
-        # a way to test - send a tell to death_loop
-        slain_regexp = r'^death_loop'
-        m = re.match(slain_regexp, trunc_line)
-        if m:
-            # add this message to the list of death messages
-            # since this is just for testing, disarm the kill-gun
-            self._death_list.append(line)
-            starprint(f'DeathLoopVaccine:  Death count = {len(self._death_list)}')
-            self._kill_armed = False
-
-        # only do the list-purging if there are already some death messages in the list, else skip this
-        if len(self._death_list) > 0:
+    def check_for_simulated_death(self, timestamp: datetime, text: str) -> None:
+        """
+        simulated player death, since this is just for testing, disarm the kill-gun
 
-            # create a datetime object for this line, using the very capable datetime.strptime()
-            now = timestamp
-
-            # now purge any death messages that are too old
-            done = False
-            while not done:
-                # if the list is empty, we're done
-                if len(self._death_list) == 0:
-                    self.reset()
-                    done = True
-                # if the list is not empty, check if we need to purge some old entries
-                else:
-                    oldest_line = self._death_list[0]
-                    oldest_time = datetime.strptime(oldest_line[0:26], '[%a %b %d %H:%M:%S %Y]')
-                    elapsed_seconds = now - oldest_time
-
-                    if elapsed_seconds.total_seconds() > config.data['deathloopvaccine']['seconds']:
-                        # that death message is too old, purge it
-                        self._death_list.pop(0)
-                        starprint(f'DeathLoopVaccine:  Death count = {len(self._death_list)}')
-                    else:
-                        # the oldest death message is inside the window, so we're done purging
-                        done = True
+        Args:
+            timestamp: A datetime.datetime object, created from the timestamp text of the raw logfile line
+            text: The text following the everquest timestamp
+
+        Returns:
+            None:
+        """
+
+        self._kill_armed = False
+        self.check_for_death(timestamp, text)
+
+    def purge_old_deaths(self, timestamp: datetime) -> None:
+        """
+        purge any death messages that are too old
+
+        Deaths are only counted when a new one arrives, so the purge only has to run then,
+        rather than on every line
+
+        Args:
+            timestamp: A datetime.datetime object, created from the timestamp text of the raw logfile line
+
+        Returns:
+            None:
+        """
+
+        now = timestamp
+        while self._death_list:
+            oldest_line = self._death_list[0]
+            oldest_time = parse_timestamp(oldest_line)
+            elapsed_seconds = now - oldest_time
+
+            if elapsed_seconds.total_seconds() > config.data['deathloopvaccine']['seconds']:
+                # that death message is too old, purge it
+                self._death_list.pop(0)
+                starprint(f'DeathLoopVaccine:  Death count = {len(self._death_list)}')
+            else:
+                # the oldest death message is inside the window, so we're done purging
+                return
+
+        # if the list is empty, start over
+        self.reset()
 
     def check_not_afk(self, timestamp: datetime, text: str) -> None:
         """
-        check for "proof of life" indications the player is really not AFK
+        "proof of life" indication the player is really not AFK
 
         Args:
             timestamp: A datetime.datetime object, created from the timestamp text of the raw logfile line
@@ -161,41 +200,41 @@ class DeathLoopVaccine(Parser):
         # only do the proof of life checks if there are already some death messages in the list, else skip this
         if len(self._death_list) > 0:
 
-            # check for proof of life, things that indicate the player is not actually AFK
-            # begin by assuming the player is AFK
-            afk = True
-
-            trunc_line = text
+            # player is not AFK, go ahead and purge any death messages from the list
             line = f'[{timestamp.strftime("%a %b %d %H:%M:%S %Y")}] ' + text
+            starprint(f'DeathLoopVaccine:  Player Not AFK: {line}')
+            self.reset()
+
+    def check_own_tell(self, timestamp: datetime, text: str, match: re.Match) -> None:
+        """
+        proof of life if the player sent a tell, i.e. '<char_name> -> <name>: ...'
+
+        Args:
+            timestamp: A datetime.datetime object, created from the timestamp text of the raw logfile line
+            text: The text following the everquest timestamp
+            match: the match of the tell regex
+
+        Returns:
+            None:
+        """
 
-            # does this line contain a proof of life - casting
-            regexp = r'^You begin casting'
-            m = re.match(regexp, trunc_line)
-            if m:
-                # player is not AFK
-                afk = False
-                starprint(f'DeathLoopVaccine:  Player Not AFK: {line}')
-
-            # does this line contain a proof of life - communication
-            # this captures tells, say, group, auction, and shout channels
-            regexp = f'^(You told|You say|You tell|You auction|You shout|{config.char_name} ->)'
-            m = re.match(regexp, trunc_line)
-            if m:
-                # player is not AFK
-                afk = False
-                starprint(f'DeathLoopVaccine:  Player Not AFK: {line}')
-
-            # does this line contain a proof of life - melee
-            regexp = r'^You( try to)? (hit|slash|pierce|crush|claw|bite|sting|maul|gore|punch|kick|backstab|bash|slice)'
-            m = re.match(regexp, trunc_line)
-            if m:
-                # player is not AFK
-                afk = False
-                starprint(f'DeathLoopVaccine:  Player Not AFK: {line}')
-
-            # if they are not AFK, then go ahead and purge any death messages from the list
-            if not afk:
-                self.reset()
+        if match.group(1) == config.char_name:
+            self.check_not_afk(timestamp, text)
+
+    def check_not_afk_melee(self, timestamp: datetime, text: str, match: re.Match) -> None:
+        """
+        proof of life if the player is fighting
+
+        Args:
+            timestamp: A datetime.datetime object, created from the timestamp text of the raw logfile line
+            text: The text following the everquest timestamp
+            match: the match of the melee regex
+
+        Returns:
+            None:
+        """
+
+        self.check_not_afk(timestamp, text)
 
     def deathloop_response(self) -> None:
         """
@@ -232,7 +271,9 @@ class DeathLoopVaccine(Parser):
 
                 # for testing the actual kill process using simulated player deaths, uncomment the following line
                 # self._kill_armed = True
-                if self._kill_armed:
+                if self.replaying:
+                    starprint('(Note: Process Kill skipped, since the deaths were replayed from the log backlog)')
+                elif self._kill_armed:
                     os.kill(pid, signal.SIGTERM)
                 else:
                     starprint('(Note: Process Kill only simulated, since death(s) were simulated)')
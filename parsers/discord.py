@@ -237,3 +237,7 @@ class Discord(ParserWindow):
 
     def parse(self, timestamp, text):
         pass
+
+    def register_triggers(self, registry):
+        # the overlay does not react to log lines
+        pass
@@ -4,7 +4,7 @@ import traceback
 import os
 
 import pathvalidate
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, pyqtSignal
 from PyQt6.QtGui import QPainter, QTransform, QColor, QPen, QAction
 from PyQt6.QtWidgets import (QGraphicsScene, QGraphicsView, QInputDialog,
                              QMenu, QLineEdit, QGraphicsPathItem)
@@ -14,11 +14,14 @@ from helpers import config, to_range, text_time_to_seconds
 from .mapclasses import (MapPoint, WayPoint, Player, SpawnPoint, MouseLocation,
                          PointOfInterest, UserWaypoint)
 from .mapdata import MapData, MAP_FILES_PATHLIB, ICON_MAP
+from .maploader import MapLoader
 
 
 class MapCanvas(QGraphicsView):
     """Map Widget for Everquest Map Files."""
 
+    map_changed = pyqtSignal()  # a map was loaded and shown
+
     def __init__(self):
 
         self._data = None
@@ -41,15 +44,35 @@ class MapCanvas(QGraphicsView):
         self._path_recording_name = ""
         self._path_file = None
         self._path_last_loc = None
+        self._loader = MapLoader()
+        self._loader.loaded.connect(self._map_loaded)
+
+    def load_map(self, map_name, wait=False):
+        # map files are read on the loader's threads, shown in _map_loaded
+        self._loader.load(str(map_name), wait)
+
+    def requested_zone(self):
+        """The zone of the map being loaded, or else of the one shown."""
+        return self._loader.zone or (self._data.zone if self._data else '')
+
+    def loading(self):
+        """True while the map shown is not yet the one asked for."""
+        return self._loader.loading
+
+    def prefetch_maps(self):
+        self._loader.prefetch()
 
-    def load_map(self, map_name):
+    def _map_loaded(self, zone, compiled):
         try:
-            map_data = MapData(str(map_name))
+            map_data = MapData(zone, compiled)
 
         except:
             traceback.print_exc()
 
         else:
+            if self._data is not None:
+                for spawn in self._data.spawns:
+                    spawn.stop()
             self._data = map_data
             self._scene.clear()
             self._z_index = 0
@@ -69,6 +92,7 @@ class MapCanvas(QGraphicsView):
             self._scene.addItem(self._mouse_location)
             config.data['maps']['last_zone'] = self._data.zone
             config.save()
+            self.map_changed.emit()
 
     def _draw(self):
         for z in self._data.keys():
@@ -397,10 +421,12 @@ class MapCanvas(QGraphicsView):
                 group = pixmap.parentItem()
                 if group:
                     self._data.spawns.remove(group)
+                    group.stop()
                     self._scene.removeItem(group)
 
         if action == spawn_point_delete_all:
             for spawn in self._data.spawns:
+                spawn.stop()
                 self._scene.removeItem(spawn)
             self._data.spawns = []
 
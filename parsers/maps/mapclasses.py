@@ -1,12 +1,13 @@
 import datetime
 
 import colorhash
-from PyQt6.QtCore import Qt, QTimer, QPointF
+from PyQt6.QtCore import Qt, QPointF
 from PyQt6.QtGui import QPixmap, QPen
 from PyQt6.QtWidgets import (QGraphicsItemGroup, QGraphicsLineItem,
                              QGraphicsPixmapItem, QGraphicsTextItem)
 
 from helpers import format_time, get_degrees_from_line, to_eq_xy
+from helpers.timerwheel import get_timer_wheel
 
 
 class MouseLocation(QGraphicsTextItem):
@@ -139,28 +140,23 @@ class SpawnPoint(QGraphicsItemGroup):
         self.pixmap = pixmap
         self.text = text
 
-        self.timer = QTimer()
-
     def _update(self):
-        if self.timer:
-            remaining = self._end_time - datetime.datetime.now()
-            remaining_seconds = remaining.total_seconds()
-            if remaining_seconds < 0:
-                self.stop()
-            elif remaining_seconds <= 30:
-                self.text.setHtml(
-                    "<font color='red' size='5'>{}</font>".format(
-                        format_time(remaining))
-                )
-            else:
-                self.text.setHtml(
-                    "<font color='white'>{}</font>".format(
-                        format_time(remaining))
-                )
-            self.realign()
-
-            if remaining_seconds > 0 and self.timer:
-                self.timer.singleShot(1000, self._update)
+        # called every second by the timer wheel while counting down
+        remaining = self._end_time - datetime.datetime.now()
+        remaining_seconds = remaining.total_seconds()
+        if remaining_seconds < 0:
+            self.stop()
+        elif remaining_seconds <= 30:
+            self.text.setHtml(
+                "<font color='red' size='5'>{}</font>".format(
+                    format_time(remaining))
+            )
+        else:
+            self.text.setHtml(
+                "<font color='white'>{}</font>".format(
+                    format_time(remaining))
+            )
+        self.realign()
 
     def realign(self, scale=None):
         if scale:
@@ -172,10 +168,11 @@ class SpawnPoint(QGraphicsItemGroup):
     def start(self, _=None, timestamp=None):
         timestamp = timestamp if timestamp else datetime.datetime.now()
         self._end_time = timestamp + datetime.timedelta(seconds=self.length)
-        if self.timer:
-            self._update()
+        self._update()
+        get_timer_wheel().add(self._update)
 
     def stop(self):
+        get_timer_wheel().remove(self._update)
         self.text.setHtml(
             "<font color='green' align='center'>{}</font>".format(self.name.upper()))
 
@@ -1,6 +1,10 @@
 import csv
 import math
+import os
 import pathlib
+import pickle
+import threading
+from array import array
 from collections import Counter
 
 from PyQt6.QtGui import QColor, QPen, QPainterPath
@@ -16,11 +20,13 @@ MAP_SPAWNTIMES_FILE = 'data/maps/map_timers.csv'
 MAP_FILES_LOCATION = 'data/maps/map_files'
 MAP_FILES_PATHLIB = pathlib.Path(MAP_FILES_LOCATION)
 ICON_MAP = {'corpse': 'data/maps/spawn.png'}
+MAP_CACHE_LOCATION = 'data/maps/cache'
+MAP_CACHE_VERSION = 1
 
 
 class MapData(dict):
 
-    def __init__(self, zone=None):
+    def __init__(self, zone=None, compiled=None):
         super().__init__()
         self.zone = zone
         self.raw = {'lines': [], 'poi': [], 'grid': []}
@@ -32,65 +38,18 @@ class MapData(dict):
         self.grid = None
 
         if self.zone is not None:
-            self._load()
-
-    def _load(self):
-        # Get list of all map files for current zone
-        map_file_name = MapData.get_zone_dict()[self.zone.strip().lower()]
-        maps = MAP_FILES_PATHLIB.glob(
-            '**/{zone}*.txt'.format(zone=map_file_name))
-
-        all_x, all_y, all_z = [], [], []
-
-        # TODO: Remove the references to raw
-        # Create Lines and Points
-        for map_file in maps:
-            print("Loading: %s" % map_file)
-            with open(map_file, 'r') as f:
-                for line in f.readlines():
-                    line_type = line.lower()[0:1]
-                    data = [value.strip() for value in line[1:].split(',')]
-                    if line_type == 'l':  # line
-                        x1, y1, z1, x2, y2, z2 = list(map(float, data[0:6]))
-                        self.raw['lines'].append(MapLine(
-                            x1=x1,
-                            y1=y1,
-                            z1=z1,
-                            x2=x2,
-                            y2=y2,
-                            z2=z2,
-                            color=self.color_transform(QColor(
-                                int(data[6]),
-                                int(data[7]),
-                                int(data[8])
-                            ))
-                        ))
-                        all_x.extend((x1, x2))
-                        all_y.extend((y1, y2))
-                        all_z.append(min(z1, z2))
-                        # if abs(z1 - z2) < 2:
-                        # if z1 == z2:
-                        # all_z.extend((z1, z2))
-
-                    elif line_type == 'p':  # point
-                        x, y, z = map(float, data[0:3])
-                        self.raw['poi'].append(MapPoint(
-                            x=x,
-                            y=y,
-                            z=z,
-                            size=int(data[6]),
-                            text=str(data[7]),
-                            color=self.color_transform(QColor(
-                                int(data[3]),
-                                int(data[4]),
-                                int(data[5])
-                            ))
-                        ))
+            self._load(compiled)
 
-        # Create Grid Lines
-        lowest_x, highest_x, lowest_y, highest_y, lowest_z, highest_z = min(all_x), max(all_x), min(all_y), max(
-            all_y), min(all_z), max(all_z)
+    def _load(self, compiled=None):
+        # compiled maps may come from a MapLoader, only the Qt items are made here
+        if compiled is None:
+            map_file_name = MapData.get_zone_dict()[self.zone.strip().lower()]
+            compiled = load_compiled_map(map_file_name)
+        lowest_x, highest_x, lowest_y, highest_y, lowest_z, highest_z = compiled['bounds']
+        z_groups = compiled['z_groups']
+        self._z_groups = z_groups
 
+        # Create Grid Lines
         left, right = int(math.floor(lowest_x / 1000) *
                           1000), int(math.ceil(highest_x / 1000) * 1000)
         top, bottom = int(math.floor(lowest_y / 1000) *
@@ -116,65 +75,26 @@ class MapData(dict):
         ))
         self.grid.setZValue(0)
 
-        # Get z levels
-        counter = Counter(all_z)
-
-        # bunch together zgroups based on peaks with floor being low point before rise
-        z_groups = []
-        last_value = None
-        first_run = True
-        for z in sorted(counter.items(), key=lambda x: x[0]):
-            if last_value is None:
-                last_value = z
-                continue
-            if (abs(last_value[0] - z[0]) < 20) or z[1] < 8:
-                last_value = (last_value[0], last_value[1] + z[1])
-            else:
-                if first_run:
-                    first_run = False
-                    if last_value[1] < 40 or abs(last_value[0] - z[0]) < 18:
-                        last_value = z
-                        continue
-                z_groups.append(last_value[0])
-                last_value = z
-
-        # get last iteration
-        if last_value[1] > 50:
-            z_groups.append(last_value[0])
-
-        self._z_groups = z_groups
-
-        # Create QGraphicsPathItem for lines seperately to retain colors
-        temp_dict = {}
-        for l in self.raw['lines']:
-            lz = min(l.z1, l.z2)
-            lz = self.get_closest_z_group(lz)
-            if not temp_dict.get(lz, None):
-                temp_dict[lz] = {'paths': {}}
-            lc = l.color.getRgb()
-            if not temp_dict[lz]['paths'].get(lc, None):
-                path_item = QGraphicsPathItem()
-                path_item.setPen(
-                    QPen(l.color, config.data['maps']['line_width']))
-                temp_dict[lz]['paths'][lc] = path_item
-            path = temp_dict[lz]['paths'][lc].path()
-            path.moveTo(l.x1, l.y1)
-            path.lineTo(l.x2, l.y2)
-            temp_dict[lz]['paths'][lc].setPath(path)
-
-        # Group QGraphicsPathItems into QGraphicsItemGroups and update self
-        for z in temp_dict:
+        # Create QGraphicsPathItem for lines seperately to retain colors, one path per
+        # color and z group, from the segments compiled for it
+        for z, colors in compiled['lines'].items():
             item_group = QGraphicsItemGroup()
-            for (_, path) in temp_dict[z]['paths'].items():
-                item_group.addToGroup(path)
-            self[z] = {'paths': None, 'poi': []}
-            self[z]['paths'] = item_group
+            for rgba, segments in colors.items():
+                path = QPainterPath()
+                for i in range(0, len(segments), 4):
+                    path.moveTo(segments[i], segments[i + 1])
+                    path.lineTo(segments[i + 2], segments[i + 3])
+                path_item = QGraphicsPathItem(path)
+                path_item.setPen(QPen(QColor(*rgba), config.data['maps']['line_width']))
+                item_group.addToGroup(path_item)
+            self[z] = {'paths': item_group, 'poi': []}
 
         # Create Points of Interest
-        for p in self.raw['poi']:
-            z = self.get_closest_z_group(p.z)
+        for z, x, y, point_z, size, text, rgba in compiled['poi']:
+            point = MapPoint(x=x, y=y, z=point_z, size=size, text=text, color=QColor(*rgba))
+            self.raw['poi'].append(point)
             self[z]['poi'].append(
-                PointOfInterest(location=p)
+                PointOfInterest(location=point)
             )
 
         self.geometry = MapGeometry(
@@ -197,12 +117,7 @@ class MapData(dict):
             self.spawn_timer_dict = dict(reader)
 
     def get_closest_z_group(self, z):
-        closest = min(self._z_groups, key=lambda x: abs(x - z))
-        if z < closest:
-            lower_index = self._z_groups.index(closest) - 1
-            if lower_index > -1:
-                closest = self._z_groups[lower_index]
-        return closest
+        return closest_z_group(self._z_groups, z)
 
     @staticmethod
     def get_zone_dict():
@@ -241,3 +156,131 @@ class MapData(dict):
         if lightness < 150:
             return color.lighter(150)
         return color
+
+
+def closest_z_group(z_groups, z):
+    closest = min(z_groups, key=lambda x: abs(x - z))
+    if z < closest:
+        lower_index = z_groups.index(closest) - 1
+        if lower_index > -1:
+            closest = z_groups[lower_index]
+    return closest
+
+
+def get_map_sources(map_file_name):
+    """Returns the (path, size, mtime) of the map files of a zone, which compiled maps are checked against."""
+    sources = []
+    for map_file in sorted(MAP_FILES_PATHLIB.glob('**/{zone}*.txt'.format(zone=map_file_name))):
+        stat = map_file.stat()
+        sources.append((str(map_file), stat.st_size, stat.st_mtime_ns))
+    return sources
+
+
+def load_compiled_map(map_file_name):
+    """
+    Returns the compiled map of a zone (see compile_map), from its cache in
+    MAP_CACHE_LOCATION unless a map file changed since.
+    """
+    sources = get_map_sources(map_file_name)
+    cache_name = os.path.join(MAP_CACHE_LOCATION, '{}.cache'.format(map_file_name))
+    try:
+        with open(cache_name, 'rb') as f:
+            compiled = pickle.load(f)
+        if compiled['version'] == MAP_CACHE_VERSION and compiled['sources'] == sources:
+            return compiled
+    except Exception:
+        pass  # missing, outdated or unreadable, compile it again
+
+    compiled = compile_map(sources)
+    try:
+        os.makedirs(MAP_CACHE_LOCATION, exist_ok=True)
+        # maps are compiled on the MapLoader threads too
+        temp_name = '{}.{}.tmp'.format(cache_name, threading.get_ident())
+        with open(temp_name, 'wb') as f:
+            pickle.dump(compiled, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_name, cache_name)
+    except OSError as error:
+        print('Unable to cache map {}: {}'.format(map_file_name, error))
+    return compiled
+
+
+def compile_map(sources):
+    """
+    Reads the map files of get_map_sources into plain data:
+        bounds: (lowest_x, highest_x, lowest_y, highest_y, lowest_z, highest_z) of the lines
+        z_groups: floor heights, ascending
+        lines: {z group: {(r, g, b, a): array('f') of x1, y1, x2, y2 per line}}
+        poi: [(z group, x, y, z, size, text, (r, g, b, a))]
+    """
+    lines = []  # (x1, y1, x2, y2, z, rgba)
+    points = []  # (x, y, z, size, text, rgba)
+    all_x, all_y, all_z = [], [], []
+    colors = {}  # (r, g, b): color_transform rgba
+
+    for map_file, _, _ in sources:
+        print("Loading: %s" % map_file)
+        with open(map_file, 'r') as f:
+            for line in f:
+                line_type = line[0:1].lower()
+                if line_type not in ('l', 'p'):
+                    continue
+                data = [value.strip() for value in line[1:].split(',')]
+                if line_type == 'l':  # line
+                    x1, y1, z1, x2, y2, z2 = list(map(float, data[0:6]))
+                    rgb = (int(data[6]), int(data[7]), int(data[8]))
+                    if rgb not in colors:
+                        colors[rgb] = MapData.color_transform(QColor(*rgb)).getRgb()
+                    lines.append((x1, y1, x2, y2, min(z1, z2), colors[rgb]))
+                    all_x.extend((x1, x2))
+                    all_y.extend((y1, y2))
+                    all_z.append(min(z1, z2))
+
+                else:  # point
+                    x, y, z = map(float, data[0:3])
+                    rgb = (int(data[3]), int(data[4]), int(data[5]))
+                    if rgb not in colors:
+                        colors[rgb] = MapData.color_transform(QColor(*rgb)).getRgb()
+                    points.append((x, y, z, int(data[6]), str(data[7]), colors[rgb]))
+
+    # Get z levels
+    counter = Counter(all_z)
+
+    # bunch together zgroups based on peaks with floor being low point before rise
+    z_groups = []
+    last_value = None
+    first_run = True
+    for z in sorted(counter.items(), key=lambda x: x[0]):
+        if last_value is None:
+            last_value = z
+            continue
+        if (abs(last_value[0] - z[0]) < 20) or z[1] < 8:
+            last_value = (last_value[0], last_value[1] + z[1])
+        else:
+            if first_run:
+                first_run = False
+                if last_value[1] < 40 or abs(last_value[0] - z[0]) < 18:
+                    last_value = z
+                    continue
+            z_groups.append(last_value[0])
+            last_value = z
+
+    # get last iteration
+    if last_value[1] > 50:
+        z_groups.append(last_value[0])
+
+    grouped = {}
+    for x1, y1, x2, y2, z, rgba in lines:
+        segments = grouped.setdefault(closest_z_group(z_groups, z), {})
+        if rgba not in segments:
+            segments[rgba] = array('f')
+        segments[rgba].extend((x1, y1, x2, y2))
+
+    return {
+        'version': MAP_CACHE_VERSION,
+        'sources': sources,
+        'bounds': (min(all_x), max(all_x), min(all_y), max(all_y), min(all_z), max(all_z)),
+        'z_groups': z_groups,
+        'lines': grouped,
+        'poi': [(closest_z_group(z_groups, z), x, y, z, size, text, rgba)
+                for x, y, z, size, text, rgba in points],
+    }
@@ -0,0 +1,147 @@
+"""
+Loads compiled maps (see mapdata.compile_map) on a thread pool, so zoning does not stall
+the overlay, and prefetches the zones likely to come next while the loading screen is up.
+"""
+import traceback
+from collections import Counter, OrderedDict, deque
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from .mapdata import MapData, load_compiled_map
+
+LOADED_MAPS = 8  # compiled maps kept in memory
+PREFETCH_ZONES = 3  # zones prefetched while zoning
+RECENT_ZONES = 5
+
+
+def zone_key(zone):
+    """Key of a zone in the zone dictionary and the caches, its name as typed in lower case."""
+    return zone.strip().lower()
+
+
+class MapLoaderSignals(QObject):
+    done = pyqtSignal(str, object)  # zone key, compiled map or None if it failed
+
+
+class LoadMap(QRunnable):
+    """Reads the compiled map of a zone_key."""
+
+    def __init__(self, zone, signals):
+        super().__init__()
+        self.zone = zone
+        self.signals = signals
+
+    def run(self):
+        try:
+            map_file_name = MapData.get_zone_dict()[self.zone]
+            compiled = load_compiled_map(map_file_name)
+        except Exception:
+            traceback.print_exc()
+            compiled = None
+        self.signals.done.emit(self.zone, compiled)
+
+
+class MapLoader(QObject):
+    """
+    Emits loaded(zone, compiled map) for the last zone asked for with load, zone as it
+    was given. Compiled maps are only read, the same one is handed out again when a
+    zone is entered again. The caches and zone history go by zone_key.
+    """
+
+    loaded = pyqtSignal(str, object)
+
+    def __init__(self):
+        super().__init__()
+        self._pool = QThreadPool()
+        self._pool.setMaxThreadCount(2)
+        self._signals = MapLoaderSignals()
+        self._signals.done.connect(self._done)
+        self._maps = OrderedDict()  # zone key: compiled map, most recently used last
+        self._loading = set()  # zone keys on the pool
+        self._wanted = None  # zone to show once loaded
+        self._zone = None  # zone last shown
+        self._next_zones = {}  # zone key: Counter of the zone keys entered from it
+        self._recent = deque(maxlen=RECENT_ZONES)
+
+    @property
+    def zone(self):
+        """The zone being loaded for showing, or else the one shown."""
+        return self._wanted or self._zone
+
+    @property
+    def loading(self):
+        """True while the zone asked for last is not shown yet."""
+        return self._wanted is not None
+
+    def load(self, zone, wait=False):
+        """Load zone for showing, on the pool unless wait."""
+        zone = zone.strip()
+        key = zone_key(zone)
+        self._wanted = zone
+        if key in self._maps:
+            self._maps.move_to_end(key)
+            self._show(zone, self._maps[key])
+        elif wait:
+            try:
+                compiled = load_compiled_map(MapData.get_zone_dict()[key])
+            except Exception:
+                traceback.print_exc()
+                self._wanted = None
+            else:
+                self._keep(key, compiled)
+                self._show(zone, compiled)
+        else:
+            self._start(key)
+
+    def prefetch(self):
+        """Load the zones likely to be entered from the current one, e.g. while zoning."""
+        for zone in self.likely_next_zones():
+            if zone not in self._maps:
+                self._start(zone)
+
+    def likely_next_zones(self):
+        # zones entered from here before, most often first, then the last zones visited
+        current = zone_key(self._zone) if self._zone is not None else None
+        zones = []
+        if current in self._next_zones:
+            zones.extend(zone for zone, _ in self._next_zones[current].most_common())
+        zones.extend(reversed(self._recent))
+        next_zones = []
+        for zone in zones:
+            if zone != current and zone not in next_zones:
+                next_zones.append(zone)
+        return next_zones[:PREFETCH_ZONES]
+
+    def _start(self, zone):
+        if zone not in self._loading:
+            self._loading.add(zone)
+            self._pool.start(LoadMap(zone, self._signals))
+
+    def _done(self, key, compiled):
+        self._loading.discard(key)
+        wanted = self._wanted is not None and zone_key(self._wanted) == key
+        if compiled is None:
+            if wanted:
+                self._wanted = None  # keep showing the last map
+            return
+        self._keep(key, compiled)
+        if wanted:
+            self._show(self._wanted, compiled)
+
+    def _keep(self, key, compiled):
+        self._maps[key] = compiled
+        self._maps.move_to_end(key)
+        while len(self._maps) > LOADED_MAPS:
+            self._maps.popitem(last=False)
+
+    def _show(self, zone, compiled):
+        self._wanted = None
+        key = zone_key(zone)
+        if self._zone is not None and key != zone_key(self._zone):
+            previous = zone_key(self._zone)
+            self._next_zones.setdefault(previous, Counter())[key] += 1
+            if previous in self._recent:
+                self._recent.remove(previous)
+            self._recent.append(previous)
+        self._zone = zone
+        self.loaded.emit(zone, compiled)
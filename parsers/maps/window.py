@@ -1,17 +1,16 @@
 """Map parser for nparse."""
 import datetime
-import re
 
 from PyQt6.QtWidgets import QHBoxLayout, QPushButton
 
-from helpers import config, to_real_xy, ParserWindow, location_service
+from helpers import config, ParserWindow, location_service
+from helpers.triggers import TriggerRegistry
 
+from ..trackers import ZoneTracker
 from .mapcanvas import MapCanvas
 from .mapclasses import MapPoint
 from .mapdata import MapData
 
-ZONE_MATCHER = re.compile(r"There (is|are) \d+ players? in (?P<zone>.+)\.")
-
 
 class Maps(ParserWindow):
 
@@ -21,8 +20,22 @@ class Maps(ParserWindow):
         self.setWindowTitle(self.name.title())
         self.set_title(self.name.title())
 
+        self._tracker = ZoneTracker()
+        self._tracker.subscribe(self._zone_event)
+        self._event_handlers = {
+            'zoning': self._zoning_started,
+            'zone_changed': self._zone_entered,
+            'who_zone': self._who_zone,
+            'location': self._location,
+            'player_died': self._player_died,
+        }
+        self._triggers = TriggerRegistry()
+        self.register_triggers(self._triggers)
+
         # interface
         self._map = MapCanvas()
+        self._map.map_changed.connect(self._map_changed)
+        self._pending_location = None  # (zone, timestamp, x, y, z) of a /loc while the map loads
         self.content.addWidget(self._map, 1)
         # buttons
         button_layout = QHBoxLayout()
@@ -60,63 +73,99 @@ class Maps(ParserWindow):
         self.menu_area.addLayout(button_layout)
 
         if config.data['maps']['last_zone']:
-            self._map.load_map(config.data['maps']['last_zone'])
+            self._map.load_map(config.data['maps']['last_zone'], wait=True)
         else:
-            self._map.load_map('west freeport')
+            self._map.load_map('west freeport', wait=True)
         location_service.start_location_service(self.update_locs)
 
+    def register_triggers(self, registry):
+        self._tracker.register_triggers(registry)
+        registry.add_prefix('start_recording_', self._start_recording)
+        registry.add_prefix('rename_recording_', self._rename_recording)
+        registry.add_prefix('stop_recording', self._stop_recording)
+
     def parse(self, timestamp, text):
-        if text[:23] == 'LOADING, PLEASE WAIT...':
-            pass
-        elif text[:16] == 'You have entered':
-            self._map.load_map(text[17:-1])
-        elif ZONE_MATCHER.match(text):
-            new_zone = ZONE_MATCHER.match(text).groupdict()['zone'].lower()
-            new_zone = MapData.translate_who_zone(new_zone)
-            if new_zone != self._map._data.zone.lower():
-                self._map.load_map(new_zone)
-        elif text[:16] == 'Your Location is':
-            x, y, z = [float(value) for value in text[17:].strip().split(',')]
-            x, y = to_real_xy(x, y)
-            self._map.add_player('__you__', timestamp, MapPoint(x=x, y=y, z=z))
-            self._map.record_path_loc((x, y, z))
-
-            if location_service.get_location_service_connection().enabled:
-                share_payload = {
-                    'x': x,
-                    'y': y,
-                    'z': z,
-                    'zone': self._map._data.zone,
-                    'player': config.data['sharing']['player_name'],
-                    'timestamp': timestamp.isoformat()
-                }
-                location_service.SIGNALS.send_loc.emit(share_payload)
-        elif text[:16] == "start_recording_":
-            recording_name = text.split()[0][16:]
-            if recording_name:
-                recording_name = recording_name.replace('_', ' ')
-                self._map.start_path_recording(recording_name)
-        elif text[:17] == "rename_recording_":
-            recording_name = text.split()[0][17:]
-            if recording_name:
-                recording_name = recording_name.replace('_', ' ')
-                self._map.rename_path_recording(new_name=recording_name)
-        elif text[:14] == "stop_recording":
-            self._map.stop_path_recording()
-        elif text[:19] == "You have been slain":
-            if (location_service.get_location_service_connection().enabled and
-                    '__you__' in self._map._data.players):
-                share_payload = {
-                    'x': self._map._data.players['__you__'].location.x,
-                    'y': self._map._data.players['__you__'].location.y,
-                    'z': self._map._data.players['__you__'].location.z,
-                    'zone': self._map._data.zone,
-                    'player': config.data['sharing']['player_name'],
-                    'timestamp': timestamp.isoformat(),
-                    'timeout': 60,
-                    'icon': 'corpse'
-                }
-                location_service.SIGNALS.death.emit(share_payload)
+        self._triggers.dispatch(timestamp, text)
+
+    def _zone_event(self, event):
+        handler = self._event_handlers.get(event.name)
+        if handler:
+            handler(event.timestamp, **event.data)
+
+    def _zoning_started(self, timestamp):
+        self._map.prefetch_maps()
+
+    def _zone_entered(self, timestamp, zone):
+        self._map.load_map(zone)
+
+    def _who_zone(self, timestamp, zone):
+        new_zone = MapData.translate_who_zone(zone.lower())
+        # a /who right after zoning names the zone whose map is still loading
+        if new_zone != self._map.requested_zone().lower():
+            self._map.load_map(new_zone)
+
+    def _location(self, timestamp, x, y, z):
+        zone = self._map.requested_zone()
+        if self._map.loading():
+            # the map shown is still the one of the zone left, place the last
+            # /loc once the map of this zone is up
+            self._pending_location = (zone, timestamp, x, y, z)
+        else:
+            self._pending_location = None
+            self._show_location(timestamp, x, y, z)
+
+        if (location_service.get_location_service_connection().enabled and
+                not self.replaying):
+            share_payload = {
+                'x': x,
+                'y': y,
+                'z': z,
+                'zone': zone,
+                'player': config.data['sharing']['player_name'],
+                'timestamp': timestamp.isoformat()
+            }
+            location_service.SIGNALS.send_loc.emit(share_payload)
+
+    def _show_location(self, timestamp, x, y, z):
+        self._map.add_player('__you__', timestamp, MapPoint(x=x, y=y, z=z))
+        self._map.record_path_loc((x, y, z))
+
+    def _map_changed(self):
+        if self._pending_location:
+            zone, timestamp, x, y, z = self._pending_location
+            self._pending_location = None
+            if zone == self._map._data.zone:
+                self._show_location(timestamp, x, y, z)
+
+    def _start_recording(self, timestamp, text):
+        recording_name = text.split()[0][16:]
+        if recording_name:
+            recording_name = recording_name.replace('_', ' ')
+            self._map.start_path_recording(recording_name)
+
+    def _rename_recording(self, timestamp, text):
+        recording_name = text.split()[0][17:]
+        if recording_name:
+            recording_name = recording_name.replace('_', ' ')
+            self._map.rename_path_recording(new_name=recording_name)
+
+    def _stop_recording(self, timestamp, text):
+        self._map.stop_path_recording()
+
+    def _player_died(self, timestamp, zone):
+        if (location_service.get_location_service_connection().enabled and
+                not self.replaying and '__you__' in self._map._data.players):
+            share_payload = {
+                'x': self._map._data.players['__you__'].location.x,
+                'y': self._map._data.players['__you__'].location.y,
+                'z': self._map._data.players['__you__'].location.z,
+                'zone': self._map._data.zone,
+                'player': config.data['sharing']['player_name'],
+                'timestamp': timestamp.isoformat(),
+                'timeout': 60,
+                'icon': 'corpse'
+            }
+            location_service.SIGNALS.death.emit(share_payload)
 
     def update_locs(self, locations, waypoints):
         print(f"Locations: {locations}")
@@ -0,0 +1,342 @@
+"""Spell data from spells_us.txt, shared by the spell window and the headless trackers."""
+import hashlib
+import math
+import os
+import pickle
+import re
+import sys
+from collections import namedtuple
+from itertools import chain
+
+from helpers import config
+from helpers.triggers import PrefixTrie, literal_prefix
+
+
+class Spell:
+
+    # thousands of these stay loaded next to the game client, slots keep them small
+    __slots__ = (
+        'id', 'name', 'effect_text_you', 'effect_text_other', 'effect_text_worn_off',
+        'aoe_range', 'max_targets', 'cast_time', 'resist_type', 'duration_formula',
+        'pvp_duration_formula', 'duration', 'pvp_duration', 'type', 'spell_icon'
+    )
+
+    def __init__(self, **kwargs):
+        self.id = 0
+        self.name = ''
+        self.effect_text_you = ''
+        self.effect_text_other = ''
+        self.effect_text_worn_off = ''
+        self.aoe_range = 0
+        self.max_targets = 1
+        self.cast_time = 0
+        self.resist_type = 0
+        self.duration_formula = 0
+        self.pvp_duration_formula = 0
+        self.duration = 0
+        self.pvp_duration = 0
+        self.type = 0
+        self.spell_icon = 0
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+
+
+SPELL_FILE = 'data/spells/spells_us.txt'
+SPELL_CACHE = 'data/spells/spells_us.cache'
+SPELL_CACHE_VERSION = 2
+
+# (Spell attribute, column of spells_us.txt, type) of the columns nParse uses,
+# name keeps its case in the cache since the spell book is keyed by it
+SPELL_COLUMNS = (
+    ('id', 0, int),
+    ('name', 1, str),
+    ('effect_text_you', 6, str),
+    ('effect_text_other', 7, str),
+    ('effect_text_worn_off', 8, str),
+    ('aoe_range', 10, int),
+    ('cast_time', 13, int),
+    ('duration_formula', 16, int),
+    ('duration', 17, int),
+    ('type', 83, int),
+    ('resist_type', 85, int),
+    ('spell_icon', 144, int),
+    ('pvp_duration_formula', 181, int),
+    ('pvp_duration', 182, int),
+)
+
+
+def read_spell_rows(file_name=SPELL_FILE):
+    """Returns the SPELL_COLUMNS of every spell in spells_us.txt as tuples."""
+    rows = []
+    with open(file_name) as spell_file:
+        for line in spell_file:
+            values = line.strip().split('^')
+            # effect texts repeat a lot ("Your skin returns to normal."), share them
+            rows.append(tuple(
+                sys.intern(values[column]) if cast is str else cast(values[column])
+                for _, column, cast in SPELL_COLUMNS
+            ))
+    return rows
+
+
+def _file_digest(file_name):
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file_name, 'rb') as source:
+        for block in iter(lambda: source.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_spell_rows(file_name=SPELL_FILE, cache_name=SPELL_CACHE):
+    """
+    Returns read_spell_rows(file_name), from cache_name while it was made from the same file.
+
+    The cache is checked against the size and modification time of the spell file, and if
+    those changed, against a hash of its contents, so a copied but identical file is not
+    parsed again. It is rebuilt whenever the spell file is updated.
+    """
+    stat = os.stat(file_name)
+    cache = None
+    try:
+        with open(cache_name, 'rb') as cache_file:
+            cache = pickle.load(cache_file)
+        if cache['version'] != SPELL_CACHE_VERSION:
+            cache = None
+    except Exception:
+        cache = None
+
+    if cache and (cache['size'], cache['mtime']) == (stat.st_size, stat.st_mtime_ns):
+        return cache['rows']
+
+    digest = _file_digest(file_name)
+    if cache and cache['digest'] == digest:
+        rows = cache['rows']
+    else:
+        rows = read_spell_rows(file_name)
+    try:
+        with open(cache_name, 'wb') as cache_file:
+            pickle.dump({
+                'version': SPELL_CACHE_VERSION,
+                'size': stat.st_size,
+                'mtime': stat.st_mtime_ns,
+                'digest': digest,
+                'rows': rows,
+            }, cache_file, pickle.HIGHEST_PROTOCOL)
+    except OSError as error:
+        print('Unable to write spell cache {}: {}'.format(cache_name, error))
+    return rows
+
+
+def create_spell_book():
+    """ Returns a dictionary of Spell by k, v -> spell_name, Spell() """
+    spell_book = {}
+    text_lookup_self = {}
+    text_lookup_other = {}
+    keys = [key for key, _, _ in SPELL_COLUMNS]
+    for row in load_spell_rows():
+        spell = Spell(**dict(zip(keys, row)))
+        spell_book[spell.name] = spell
+        spell.name = spell.name.lower()
+        spell.max_targets = 6 if spell.aoe_range > 0 else 1
+        text_lookup_self[spell.effect_text_you] = spell
+        text_lookup_other[spell.effect_text_other] = spell
+    return spell_book, text_lookup_self, text_lookup_other
+
+
+class Landing(namedtuple('Landing', ['effect_text', 'target', 'spells'])):
+    """A log line read as the landing message of spells, target is '__you__' for effect_text_you."""
+
+    __slots__ = ()
+
+    def is_of(self, spell):
+        if self.target == '__you__':
+            return self.effect_text == spell.effect_text_you
+        return self.effect_text == spell.effect_text_other
+
+
+class EffectTextIndex:
+    """
+    Landing messages of a spell book: a hash of the exact effect_text_you lines and one of
+    the effect_text_other suffixes, which follow the target's name, looked up by the few
+    lengths those have. Also a hash of the exact lines of spells wearing off of you.
+    """
+
+    def __init__(self, spells):
+        self.you = {}  # effect_text_you: [Spell]
+        self.worn_off = {}  # effect_text_worn_off: {Spell.id}
+        self.other = {}  # effect_text_other: [Spell]
+        seen = set()
+        for spell in spells:
+            if id(spell) in seen:
+                continue
+            seen.add(id(spell))
+            if spell.effect_text_you:
+                self.you.setdefault(spell.effect_text_you, []).append(spell)
+            if spell.effect_text_other.strip():
+                self.other.setdefault(spell.effect_text_other, []).append(spell)
+            if spell.effect_text_worn_off.strip():
+                self.worn_off.setdefault(spell.effect_text_worn_off, set()).add(spell.id)
+        self._other_lengths = sorted({len(text) for text in self.other})
+
+    def landings(self, text):
+        """Returns a Landing for every effect text the line could be, the exact 'you' text first."""
+        landings = []
+        if text in self.you:
+            landings.append(Landing(text, '__you__', self.you[text]))
+        for length in self._other_lengths:
+            if length >= len(text):
+                break
+            effect_text = text[-length:]
+            if effect_text in self.other:
+                target = text[:-length].strip()
+                if target:
+                    landings.append(Landing(effect_text, target, self.other[effect_text]))
+        return landings
+
+
+def create_effect_index(spell_book, text_you, text_other):
+    """Returns the EffectTextIndex of every spell in the dictionaries of create_spell_book."""
+    # spells sharing a name only remain in the text lookups
+    return EffectTextIndex(chain(spell_book.values(), text_you.values(), text_other.values()))
+
+
+# duration formula: ticks(level, duration), unknown formulas last 0 ticks
+DURATION_FORMULAS = {
+    0: lambda level, duration: 0,
+    1: lambda level, duration: min(int(math.ceil(level / 2.0)), duration),
+    2: lambda level, duration: min(int(math.ceil(level / 5.0 * 3)), duration),
+    3: lambda level, duration: min(int(level * 30), duration),
+    4: lambda level, duration: duration or 50,
+    5: lambda level, duration: duration or 3,
+    6: lambda level, duration: min(int(math.ceil(level / 2.0)), duration),
+    7: lambda level, duration: min(level, duration),
+    8: lambda level, duration: min(level + 10, duration),
+    9: lambda level, duration: min(int((level * 2) + 10), duration),
+    10: lambda level, duration: min(int(level * 3 + 10), duration),
+    11: lambda level, duration: duration,
+    12: lambda level, duration: duration,
+    15: lambda level, duration: duration,
+    50: lambda level, duration: 72000,
+    3600: lambda level, duration: duration or 3600,
+}
+
+# (duration formula, duration, level): ticks, filled as spells are cast, custom spells
+# all have id 0 so the key is what the duration is computed from
+_durations = {}
+_use_secondary = None  # set of spells.use_secondary, built on first use
+
+
+def clear_spell_durations():
+    """Forget the computed durations, the level or duration settings changed."""
+    global _use_secondary
+    _durations.clear()
+    _use_secondary = None
+
+
+def get_spell_duration(spell, level):
+    global _use_secondary
+    if _use_secondary is None:
+        _use_secondary = set(config.data['spells']['use_secondary'])
+    secondary = spell.name in _use_secondary or (
+        config.data['spells']['use_secondary_all'] and spell.type == 0)
+    if secondary:
+        formula, duration = spell.pvp_duration_formula, spell.pvp_duration
+    else:
+        formula, duration = spell.duration_formula, spell.duration
+    key = (formula, duration, level)
+    spell_ticks = _durations.get(key)
+    if spell_ticks is None:
+        calculate = DURATION_FORMULAS.get(formula)
+        spell_ticks = _durations[key] = calculate(level, duration) if calculate else 0
+    return spell_ticks
+
+
+def get_spell_durations(spells, level):
+    """Returns {spell name: ticks} of spells at level, e.g. the whole spell book."""
+    return {spell.name: get_spell_duration(spell, level) for spell in spells}
+
+
+def create_custom_spell(name, duration):
+    """Spell of a custom timer lasting duration ticks."""
+    return Spell(
+        name=name,
+        duration=duration,
+        duration_formula=11,  # honour duration ticks
+        spell_icon=14
+    )
+
+
+class CustomTrigger:
+
+    def __init__(self, name='', text='', time='', **_):
+        self.name, self.text, self.time = name, text, time
+
+    def to_list(self):
+        return [self.name, self.text, self.time]
+
+    def __str__(self):
+        return '{},{},{}'.format(
+            self.name, self.text, self.time
+        )
+
+
+def custom_timer_pattern(text):
+    """Regex source of a custom timer text, * stands for anything."""
+    return text.replace('*', '.*')
+
+
+class CustomTimerMatcher:
+    """
+    Matches a log line against every custom timer at once.
+
+    Custom timers match whole lines ignoring case. Timers starting with literal text are
+    looked up by the lowercase start of the line in a trie of those prefixes, so only
+    the few sharing it are tested. Timers starting with a wildcard are folded into one
+    regex with a named group per timer, testing them all in a single match, which only
+    runs on lines containing the literal text following one of their wildcards.
+    """
+
+    def __init__(self, custom_timers=()):
+        self._timers = []  # (CustomTrigger, compiled regex), index is the config order
+        self._prefixes = PrefixTrie()  # lowercase literal start of a timer: index
+        self._combined = None  # regex with group t<index> of the wildcard first timers
+        self._required = None  # regex searching the text one of those needs, if they all do
+        self._separate = []  # index of wildcard first timers that can not be combined
+        parts = []
+        required = []
+        for item in custom_timers:
+            ct = CustomTrigger(*item)
+            source = custom_timer_pattern(ct.text)
+            rx = re.compile('^{}$'.format(source), re.RegexFlag.IGNORECASE)
+            index = len(self._timers)
+            self._timers.append((ct, rx))
+            prefix = literal_prefix(source)
+            if prefix:
+                self._prefixes.add(prefix.lower(), index)
+            elif '|' in source or re.search(r'\\[1-9]|\(\?P=', source):
+                # ^a|b$ means ^a or b$, and group numbers shift in the combined regex
+                self._separate.append(index)
+            else:
+                required.append(literal_prefix(re.sub(r'^(?:\.\*)+', '', source)))
+                source = re.sub(r'\(\?P<\w+>', '(', source)
+                parts.append('(?:(?=(?:{})$)(?P<t{}>)|)'.format(source, index))
+        if parts:
+            self._combined = re.compile(''.join(parts), re.RegexFlag.IGNORECASE)
+            if all(required):
+                self._required = re.compile(
+                    '|'.join(re.escape(text) for text in required), re.RegexFlag.IGNORECASE)
+
+    def __len__(self):
+        return len(self._timers)
+
+    def matches(self, text):
+        """Returns the CustomTriggers matching text, in config order."""
+        found = [index for index in self._prefixes.matches(text.lower())
+                 if self._timers[index][1].match(text)]
+        if self._combined and (not self._required or self._required.search(text)):
+            groups = self._combined.match(text).groupdict()
+            found.extend(int(name[1:]) for name, value in groups.items() if value is not None)
+        found.extend(index for index in self._separate if self._timers[index][1].match(text))
+        if len(found) > 1:
+            found.sort()
+        return [self._timers[index][0] for index in found]
@@ -0,0 +1,42 @@
+"""Spell icons, cut from the 6x6 icon sheets in data/spells/spells0N.png."""
+import functools
+import math
+
+from PyQt6.QtCore import QRect, Qt
+from PyQt6.QtGui import QPixmap
+from PyQt6.QtWidgets import QLabel
+
+ICON_SIZE = 15
+# icons are cut and scaled on first use, recasts and list repaints reuse them
+ICON_CACHE_SIZE = 512
+
+_sheets = {}  # file name: QPixmap of the whole sheet, each decoded once
+
+
+def _get_sheet(file_name):
+    sheet = _sheets.get(file_name)
+    if sheet is None:
+        sheet = _sheets[file_name] = QPixmap(file_name)
+    return sheet
+
+
+@functools.lru_cache(maxsize=ICON_CACHE_SIZE)
+def get_spell_icon_pixmap(icon_index, size=ICON_SIZE):
+    # Spell Icons are 40x40 pixels
+    file_number = math.ceil(icon_index / 36)
+    file_name = 'data/spells/spells0' + str(file_number) + '.png'
+    spell_number = icon_index % 36
+    file_row = math.floor((spell_number + 6) / 6)
+    file_col = spell_number % 6 + 1
+    x = (file_col - 1) * 40
+    y = (file_row - 1) * 40
+    icon_image = _get_sheet(file_name)
+    return icon_image.copy(QRect(x, y, 40, 40)).scaled(
+        size, size, transformMode=Qt.TransformationMode.SmoothTransformation)
+
+
+def get_spell_icon(icon_index):
+    label = QLabel()
+    label.setPixmap(get_spell_icon_pixmap(icon_index))
+    label.setFixedSize(ICON_SIZE, ICON_SIZE)
+    return label
@@ -0,0 +1,320 @@
+"""
+List view of the spell timers: one QListView painting every target and timer row with a
+delegate, instead of a frame, layout, progress bar and labels per active spell. Only the
+rows scrolled into view are painted, so it scales to hundreds of timers.
+"""
+import bisect
+import datetime
+import string
+
+from PyQt6.QtCore import QAbstractListModel, QModelIndex, QRect, QSize, Qt, pyqtSignal
+from PyQt6.QtGui import QColor, QFont, QLinearGradient, QPalette, QPen
+from PyQt6.QtWidgets import QAbstractItemView, QListView, QStyledItemDelegate
+
+from helpers import config, format_time
+from helpers.timerwheel import get_timer_wheel
+
+from .spellbook import get_spell_duration
+from .spellicons import ICON_SIZE, get_spell_icon_pixmap
+
+TARGET_ROW_HEIGHT = 20
+TIMER_ROW_HEIGHT = 17
+
+# (TargetType of the target label in _.css): gradient color
+TARGET_COLORS = {0: QColor('#287AA9'), 1: QColor('#004400'), 2: QColor('#440000')}
+
+# spell.type: progress bar gradient, as #SpellWidgetProgressBarGood/Bad::chunk
+BAR_COLORS = {
+    True: (QColor('#FFF'), QColor('#21B6A8'), QColor('#287AA9')),
+    False: (QColor('#FFF'), QColor('#FF9900'), QColor('#DD7700')),
+}
+
+
+class SpellTimer:
+    """A spell on a target, the list view counterpart of SpellWidget."""
+
+    def __init__(self, spell, timestamp):
+        self.spell = spell
+        self._paused = None  # remaining time shown while paused
+        self._calculate(timestamp)
+
+    def _calculate(self, timestamp):
+        ticks = get_spell_duration(self.spell, config.data['spells']['level'])
+        self.seconds = int(ticks * 6)
+        self.end_time = timestamp + datetime.timedelta(seconds=self.seconds)
+
+    def recast(self, timestamp):
+        self._calculate(timestamp)
+
+    def remaining(self, now):
+        return self._paused if self._paused is not None else self.end_time - now
+
+    def pause(self):
+        self._paused = self.end_time - datetime.datetime.now()
+
+    def resume(self):
+        self._paused = None
+
+    def elongate(self, seconds):
+        self.end_time += datetime.timedelta(seconds=seconds)
+
+    @property
+    def active(self):
+        return self._paused is None
+
+
+class SpellTimerTarget:
+    """Timers by target, the list view counterpart of SpellTarget."""
+
+    def __init__(self, target='__you__'):
+        self.name = target
+        if target == '__you__':
+            self.title = 'you'
+        elif target == '__custom__':
+            self.title = 'custom'
+        else:
+            self.title = target
+        self.timers = []  # [SpellTimer] by end_time
+        self._spells = {}  # spell name: SpellTimer
+
+    def spell_widgets(self):
+        """Returns a list of all SpellTimers, like SpellTarget.spell_widgets."""
+        return list(self.timers)
+
+    @property
+    def target_type(self):
+        if self.name in ('__you__', '__custom__'):
+            return 0  # user
+        if any(not timer.spell.type for timer in self.timers):
+            return 2  # enemy
+        return 1  # friendly
+
+    def add_spell(self, spell, timestamp):
+        timer = self._spells.get(spell.name)
+        if timer:
+            timer.recast(timestamp)
+            self.timers.remove(timer)
+        else:
+            timer = self._spells[spell.name] = SpellTimer(spell, timestamp)
+        bisect.insort(self.timers, timer, key=lambda timer: timer.end_time)
+
+    def remove(self, timer):
+        self.timers.remove(timer)
+        del self._spells[timer.spell.name]
+
+    def get_timer(self, spell_name):
+        return self._spells.get(spell_name)
+
+    def remove_expired(self, now):
+        """Drop the timers that ran out, returns true if any did."""
+        timers = [timer for timer in self.timers if timer.remaining(now).total_seconds() > 0]
+        if len(timers) == len(self.timers):
+            return False
+        self.timers = timers
+        self._spells = {timer.spell.name: timer for timer in timers}
+        return True
+
+
+class SpellListModel(QAbstractListModel):
+    """Flat rows of targets, each followed by its timers."""
+
+    def __init__(self):
+        super().__init__()
+        self._targets = {}  # name: SpellTimerTarget
+        self._rows = []  # SpellTimerTarget or (SpellTimerTarget, SpellTimer)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.UserRole and index.isValid():
+            return self._rows[index.row()]
+        return None
+
+    def _rebuild(self):
+        self.beginResetModel()
+        self._rows = []
+        for target in sorted(self._targets.values(), key=lambda t: (t.target_type, t.name)):
+            self._rows.append(target)
+            self._rows.extend((target, timer) for timer in target.timers)
+        self.endResetModel()
+
+    def add_spell(self, spell, timestamp, target='__you__'):
+        self.add_spells(spell, [(timestamp, target)])
+
+    def add_spells(self, spell, targets):
+        for timestamp, target in targets:
+            spell_target = self._targets.get(target)
+            if not spell_target:
+                spell_target = self._targets[target] = SpellTimerTarget(target)
+            spell_target.add_spell(spell, timestamp)
+        self._rebuild()
+
+    def spell_targets(self):
+        return list(self._targets.values())
+
+    def get_spell_target_by_name(self, name):
+        return self._targets.get(name)
+
+    def remove(self, index):
+        row = self._rows[index.row()]
+        if isinstance(row, SpellTimerTarget):
+            del self._targets[row.name]
+        else:
+            target, timer = row
+            target.remove(timer)
+            if not target.timers:
+                del self._targets[target.name]
+        self._rebuild()
+
+    def remove_spell(self, spell_name, target='__you__'):
+        spell_target = self._targets.get(target)
+        timer = spell_target.get_timer(spell_name) if spell_target else None
+        if timer:
+            spell_target.remove(timer)
+            if not spell_target.timers:
+                del self._targets[target]
+            self._rebuild()
+
+    def expire(self, now):
+        """Drop the timers that ran out, returns true if any did."""
+        expired = False
+        for target in list(self._targets.values()):
+            if target.remove_expired(now):
+                expired = True
+                if not target.timers:
+                    del self._targets[target.name]
+        if expired:
+            self._rebuild()
+        return expired
+
+    def refresh(self):
+        if self._rows:
+            self.dataChanged.emit(self.index(0), self.index(len(self._rows) - 1))
+
+
+class SpellListDelegate(QStyledItemDelegate):
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._target_font = QFont()
+        self._target_font.setPixelSize(14)
+        self._user_font = QFont(self._target_font)
+        self._user_font.setBold(True)
+        self._name_font = QFont()
+        self._name_font.setPixelSize(12)
+        self._time_font = QFont(self._name_font)
+        self._time_font.setBold(True)
+        self._warning_font = QFont(self._time_font)
+        self._warning_font.setPixelSize(16)
+
+    def sizeHint(self, option, index):
+        row = index.data(Qt.ItemDataRole.UserRole)
+        if isinstance(row, SpellTimerTarget):
+            return QSize(option.rect.width(), TARGET_ROW_HEIGHT)
+        return QSize(option.rect.width(), TIMER_ROW_HEIGHT)
+
+    def paint(self, painter, option, index):
+        row = index.data(Qt.ItemDataRole.UserRole)
+        painter.save()
+        if isinstance(row, SpellTimerTarget):
+            self._paint_target(painter, option.rect, row)
+        else:
+            self._paint_timer(painter, option, *row)
+        painter.restore()
+
+    def _paint_target(self, painter, rect, target):
+        target_type = target.target_type
+        gradient = QLinearGradient(0, rect.top(), 0, rect.bottom())
+        gradient.setColorAt(0, QColor('#000'))
+        gradient.setColorAt(0.5, QColor('#000'))
+        gradient.setColorAt(0.8, TARGET_COLORS[target_type])
+        gradient.setColorAt(1, QColor('#000'))
+        painter.fillRect(rect, gradient)
+        painter.setPen(QColor('white'))
+        painter.setFont(self._user_font if target_type == 0 else self._target_font)
+        painter.drawText(rect, Qt.AlignmentFlag.AlignCenter, target.title.title())
+
+    def _paint_timer(self, painter, option, target, timer):
+        rect = option.rect
+        remaining = timer.remaining(datetime.datetime.now())
+        remaining_seconds = max(remaining.total_seconds(), 0)
+        warning = remaining_seconds <= 30
+
+        top = rect.top() + (rect.height() - ICON_SIZE) // 2
+        painter.drawPixmap(rect.left(), top, get_spell_icon_pixmap(timer.spell.spell_icon))
+
+        bar = QRect(rect.left() + ICON_SIZE, rect.top(), rect.width() - ICON_SIZE, rect.height())
+        painter.fillRect(bar, option.palette.color(QPalette.ColorRole.Base))
+        if timer.seconds:
+            width = int(bar.width() * min(remaining_seconds / timer.seconds, 1.0))
+            top_color, middle_color, bottom_color = BAR_COLORS[bool(timer.spell.type)]
+            gradient = QLinearGradient(0, bar.top(), 0, bar.bottom())
+            gradient.setColorAt(0, top_color)
+            gradient.setColorAt(0.5, middle_color)
+            gradient.setColorAt(1, bottom_color)
+            painter.fillRect(QRect(bar.left(), bar.top(), width, bar.height()), gradient)
+        painter.setPen(QPen(QColor('red' if warning else 'black'), 1))
+        painter.drawRect(rect.adjusted(0, 0, -1, -1))
+
+        text = bar.adjusted(5, 0, -5, 0)
+        painter.setPen(option.palette.color(QPalette.ColorRole.WindowText))
+        painter.setFont(self._name_font)
+        painter.drawText(text, Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter,
+                         string.capwords(timer.spell.name))
+        if warning:
+            painter.setPen(QColor('red'))
+        painter.setFont(self._warning_font if warning else self._time_font)
+        painter.drawText(text, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter,
+                         format_time(remaining))
+
+
+class SpellListView(QListView):
+    """
+    Drop-in replacement of SpellContainer (and the scroll area around it), painting
+    the same targets and timers through SpellListModel and SpellListDelegate.
+    """
+
+    timers_changed = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.setObjectName('SpellScrollArea')
+        self._model = SpellListModel()
+        self.setModel(self._model)
+        self.setItemDelegate(SpellListDelegate(self))
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setFocusPolicy(Qt.FocusPolicy.NoFocus)
+        self.setUniformItemSizes(False)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.doubleClicked.connect(self._model.remove)
+        self._model.modelReset.connect(self._watch)
+        self._model.modelReset.connect(self.timers_changed)
+
+    def add_spell(self, spell, timestamp, target='__you__'):
+        self._model.add_spell(spell, timestamp, target)
+
+    def add_spells(self, spell, targets):
+        self._model.add_spells(spell, targets)
+
+    def remove_spell(self, spell_name, target='__you__'):
+        self._model.remove_spell(spell_name, target)
+
+    def spell_targets(self):
+        return self._model.spell_targets()
+
+    def get_spell_target_by_name(self, name):
+        return self._model.get_spell_target_by_name(name)
+
+    def _watch(self):
+        # tick only while there are timers to count down
+        wheel = get_timer_wheel()
+        if self._model.rowCount():
+            wheel.add(self._update)
+        else:
+            wheel.remove(self._update)
+
+    def _update(self):
+        if not self._model.expire(datetime.datetime.now()) and self.isVisible():
+            self._model.refresh()
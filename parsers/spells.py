@@ -1,18 +1,28 @@
+import bisect
 import datetime
-import math
 import string
-import re
+from itertools import chain
 
-from PyQt6.QtCore import QEvent, QObject, QRect, Qt, QTimer, pyqtSignal
-from PyQt6.QtGui import QPixmap
+from PyQt6.QtCore import QEvent, Qt, QTimer, pyqtSignal
 from PyQt6.QtWidgets import (QFrame, QHBoxLayout, QLabel, QProgressBar,
                              QScrollArea, QSpinBox, QVBoxLayout, QPushButton)
 
-from helpers import ParserWindow, config, format_time, text_time_to_seconds
+from helpers import ParserWindow, config, format_time
+from helpers.timerwheel import get_timer_wheel
+
+from .spellbook import (CustomTrigger, Spell,  # noqa: F401
+                        clear_spell_durations, create_custom_spell, get_spell_duration)
+from .spellicons import get_spell_icon
+from .spelllist import SpellListView
+from .spellstore import SpellTimerStore
+from .trackers import SpellTracker
+
+# how often to check for a casting window that closed without a line after it
+WINDOW_FLUSH_MSEC = 1000
 
 
 class Spells(ParserWindow):
-    """Tracks spell casting, duration, and targets by name."""
+    """Shows the spell timers of a SpellTracker, which tracks casting, duration and targets by name."""
 
     def __init__(self):
         super().__init__()
@@ -22,22 +32,37 @@ class Spells(ParserWindow):
 
         self._setup_ui()
 
-        self.spell_book, self.text_you, self.text_other = create_spell_book()
-        self._custom_timers = {}  # regex : CustomTimer
-        self.load_custom_timers()
-        self._casting = None  # holds Spell when casting
-        self._zoning = None  # holds time of zone or None
-        self._spell_triggers = []  # need a queue because of landing windows
-        self._spell_trigger = None
+        self._tracker = SpellTracker()
+        self._tracker.subscribe(self._spell_event)
+        self._event_handlers = {
+            'casting': self._casting,
+            'spell_landed': self._spell_landed,
+            'spell_worn_off': self._spell_worn_off,
+            'zoning': self._zoning_started,
+            'zoned': self._zone_entered,
+        }
+        self._window_timer = QTimer()
+        self._window_timer.setTimerType(Qt.TimerType.CoarseTimer)
+        self._window_timer.setInterval(WINDOW_FLUSH_MSEC)
+        self._window_timer.timeout.connect(self._flush_window)
+
+        self._timer_store = SpellTimerStore(self._timer_snapshot)
+        self._restore_timers()
+        self._spell_container.timers_changed.connect(self._timer_store.save_later)
 
     def _setup_ui(self):
         self.setMinimumWidth(150)
-        self._spell_container = SpellContainer()
-        self._scroll_area = QScrollArea()
-        self._scroll_area.setWidgetResizable(True)
-        self._scroll_area.setWidget(self._spell_container)
-        self._scroll_area.setObjectName('SpellScrollArea')
-        self.content.addWidget(self._scroll_area, 1)
+        if config.data['spells']['use_list_view']:
+            # one painted list instead of widgets per spell, for a lot of timers
+            self._spell_container = SpellListView()
+            self.content.addWidget(self._spell_container, 1)
+        else:
+            self._spell_container = SpellContainer()
+            self._scroll_area = QScrollArea()
+            self._scroll_area.setWidgetResizable(True)
+            self._scroll_area.setWidget(self._spell_container)
+            self._scroll_area.setObjectName('SpellScrollArea')
+            self.content.addWidget(self._scroll_area, 1)
         self._custom_timer_toggle = QPushButton('\u26A1')
         self._custom_timer_toggle.setCheckable(True)
         self._custom_timer_toggle.setToolTip('Parse Custom Timers')
@@ -51,132 +76,141 @@ class Spells(ParserWindow):
         self.menu_area.addWidget(self._level_widget, 0)
         self._level_widget.valueChanged.connect(self._level_change)
 
-    def _spell_triggered(self):
-        """SpellTrigger spell_triggered event handler. """
-        if self._spell_trigger:
-            if self._spell_trigger.activated:
-                for target in self._spell_trigger.targets:
-                    self._spell_container.add_spell(
-                        self._spell_trigger.spell, target[0], target[1])
-        self._remove_spell_trigger()
+    def register_triggers(self, registry):
+        self._tracker.register_triggers(registry)
 
     def parse(self, timestamp, text):
         """Parse casting triggers (casting, failure, success)."""
-
-        # custom timers
-        if config.data['spells']['use_custom_triggers']:
-            for rx, ct in self._custom_timers.items():
-                if rx.match(text):
-                    spell = Spell(
-                        name=ct.name,
-                        duration=int(text_time_to_seconds(ct.time)/6),
-                        duration_formula=11,  # honour duration ticks
-                        spell_icon=14
-                    )
-                    self._spell_container.add_spell(
-                        spell,
-                        timestamp,
-                        '__custom__'
-                    )
-
-        # There are three main cases:
-        # 1) Items that have cast messages like "<item> begins to glow."
-        # 2) Items that have no cast message, cast on you (mostly insta-clickies)
-        # 3) Items that have no cast message, cast on others
-        # Case 1 may require either compiling a list of these items and detecting
-        # them as triggers, or else opening it up entirely like this does.
-        # Case 2 requires completely opening up detection, but will also detect
-        # any other buff cast on you, which may include things you wouldn't expect
-        # but can also NOT include many spells (when text is shared with an AoE
-        # version). It would also not properly detect level of spell when cast
-        # by other people.
-        # Case 3 is essentially impossible to deal with.
-        if config.data['spells']['use_item_triggers'] and not self._spell_trigger:
-            if text in self.text_you:
-                spell = self.text_you[text]
-                spell_trigger = SpellTrigger(
-                    spell=spell,
-                    timestamp=timestamp
-                )
-                spell_trigger.spell_triggered.connect(self._spell_triggered)
-                self._spell_trigger = spell_trigger
-
-        if self._spell_trigger:
-            self._spell_trigger.parse(timestamp, text)
-
-        # Initial Spell Cast and trigger setup
-        if text[:17] == 'You begin casting':
-            spell = self.spell_book.get(text[18:-1], None)
-            if spell and spell.duration_formula != 0:
-                self._spell_triggered()  # in case we cut off the cast window, force trigger
-                self._remove_spell_trigger()
-
-                spell_trigger = SpellTrigger(
-                    spell=spell,
-                    timestamp=timestamp
-                )
-                spell_trigger.spell_triggered.connect(self._spell_triggered)
-                self._spell_trigger = spell_trigger
-
-        # Spell Interrupted
-        elif (self._spell_triggers and
-              text[:26] == 'Your spell is interrupted.' or
-              text[:20] == 'Your target resisted' or
-              text[:29] == 'Your spell did not take hold.' or
-              text[:26] == 'You try to cast a spell on'):
-            self._remove_spell_trigger()
-
-        # Elongate self buff timers by time zoning
-        elif text[:23] == 'LOADING, PLEASE WAIT...':
-            self._spell_triggered()
-            self._remove_spell_trigger()
-            self._zoning = timestamp
-            spell_target = self._spell_container.get_spell_target_by_name(
-                '__you__')
-            if spell_target:
-                for spell_widget in spell_target.spell_widgets():
-                    spell_widget.pause()
-        elif self._zoning and text[:16] == 'You have entered':
-            delay = (timestamp - self._zoning).total_seconds()
-            # If zoning took longer than like two minutes, likely false alarm
-            if delay > 120:
-                self._zoning = None
+        self._tracker.parse(timestamp, text)
+
+    def _spell_event(self, event):
+        handler = self._event_handlers.get(event.name)
+        if handler:
+            handler(event.timestamp, **event.data)
+
+    def _casting(self, timestamp, spell):
+        if self._tracker.window.closes is not None:
+            self._window_timer.start()
+
+    def _flush_window(self):
+        # no line came after the casting window to close it
+        self._tracker.flush_window()
+        if not self._tracker.window:
+            self._window_timer.stop()
+
+    def _spell_landed(self, timestamp, spell, targets):
+        """Add the spell to the targets it landed on"""
+        if self.replaying:
+            # backlog spells that ran out since would only be built to be removed again
+            now = datetime.datetime.now()
+            timers = self._tracker.timers
+            targets = [
+                (landed, target) for landed, target in targets
+                if timers[target][spell.name][0] > now
+            ]
+            if not targets:
+                return
+        self._spell_container.add_spells(spell, targets)
+
+    def _spell_worn_off(self, timestamp, spell, target):
+        """Remove the self buff the game reports fading, instead of waiting out its timer"""
+        self._spell_container.remove_spell(spell.name, target)
+
+    def _zoning_started(self, timestamp):
+        """Elongate self buff timers by time zoning"""
+        self._window_timer.stop()
+        spell_target = self._spell_container.get_spell_target_by_name(
+            '__you__')
+        if spell_target:
+            for spell_widget in spell_target.spell_widgets():
+                spell_widget.pause()
+            self._timer_store.save_later()
+
+    def _zone_entered(self, timestamp, delay):
+        spell_target = self._spell_container.get_spell_target_by_name(
+            '__you__')
+        if spell_target:
+            for spell_widget in spell_target.spell_widgets():
+                spell_widget.elongate(delay)
+                spell_widget.resume()
+            self._timer_store.save_later()
+
+    def _timer_snapshot(self):
+        timers = []
+        for spell_target in self._spell_container.spell_targets():
+            for spell_widget in spell_target.spell_widgets():
+                entry = {
+                    'target': spell_target.name,
+                    'end_time': spell_widget.end_time.timestamp(),
+                    'paused': not spell_widget.active
+                }
+                if spell_target.name == '__custom__':
+                    entry['name'] = spell_widget.spell.name
+                    entry['duration'] = spell_widget.spell.duration
+                else:
+                    entry['spell_id'] = spell_widget.spell.id
+                timers.append(entry)
+        return timers
+
+    def _restore_timers(self):
+        tracker = self._tracker
+        spells = None  # Spell by id, only read from the spell book when a spell was saved
+        level = config.data['spells']['level']
+        paused = []
+        for entry in self._timer_store.load():
+            if entry['target'] == '__custom__':
+                spell = create_custom_spell(entry.get('name', ''), entry.get('duration', 0))
             else:
-                spell_target = self._spell_container.get_spell_target_by_name(
-                    '__you__')
-                if spell_target:
-                    for spell_widget in spell_target.spell_widgets():
-                        spell_widget.elongate(delay)
-                        spell_widget.resume()
-
-    def _remove_spell_trigger(self):
-        if self._spell_trigger:
-            self._spell_trigger.stop()
-            self._spell_trigger.deleteLater()
-            self._spell_trigger = None
+                if spells is None:
+                    spells = {
+                        spell.id: spell for spell in chain(
+                            tracker.text_other.values(), tracker.text_you.values(),
+                            tracker.spell_book.values())
+                    }
+                spell = spells.get(entry.get('spell_id'))
+                if spell is None:
+                    continue  # no longer in spells_us.txt
+            # backdate the cast so the timer ends when it did before
+            seconds = int(get_spell_duration(spell, level) * 6)
+            tracker.add_timer(
+                spell, entry['end_time'] - datetime.timedelta(seconds=seconds), entry['target'])
+            if entry['paused']:
+                paused.append((entry['target'], spell.name))
+
+        # saved while zoning, the next zone in resumes them
+        for target, name in paused:
+            spell_target = self._spell_container.get_spell_target_by_name(target)
+            for spell_widget in spell_target.spell_widgets() if spell_target else []:
+                if spell_widget.spell.name == name:
+                    spell_widget.pause()
+                    tracker.zoning = datetime.datetime.now()
+
+    def shutdown(self):
+        self._timer_store.flush()
 
     def _level_change(self, _):
         config.data['spells']['level'] = self._level_widget.value()
         config.save()
+        clear_spell_durations()
+
+    def settings_updated(self):
+        # secondary durations may have been switched on or off
+        clear_spell_durations()
 
     def load_custom_timers(self):
-        self._custom_timers = {}
-        for item in config.data['spells']['custom_timers']:
-            ct = CustomTrigger(*item)
-            rx = re.compile(
-                "^{}$".format(ct.text.replace('*', '.*')),
-                re.RegexFlag.IGNORECASE
-                )
-            self._custom_timers[rx] = ct
+        self._tracker.load_custom_timers()
 
     def _toggle_custom_timers(self, _):
         config.data['spells']['use_custom_triggers'] = \
             self._custom_timer_toggle.isChecked()
         config.save()
+        self._tracker.triggers_changed()
 
 
 class SpellContainer(QFrame):
 
+    timers_changed = pyqtSignal()
+
     def __init__(self):
         super().__init__()
         self._layout = QVBoxLayout()
@@ -184,39 +218,70 @@ class SpellContainer(QFrame):
         self.setObjectName('SpellContainer')
         self._layout.setContentsMargins(0, 0, 0, 0)
         self._layout.addStretch(1)
+        self._targets = {}  # name: SpellTarget
+        self._ordered = []  # SpellTargets in layout order
 
     def add_spell(self, spell, timestamp, target='__you__'):
-        spell_target = None
-        new = False
-        for st in self.findChildren(SpellTarget):
-            if st.name == target:
-                spell_target = st
-        if not spell_target:
-            new = True
+        self._add_spell(spell, timestamp, target)
+        self.timers_changed.emit()
+
+    def add_spells(self, spell, targets):
+        """Add spell to every (timestamp, target), e.g. all the targets of an AoE, at once."""
+        # Qt posts one layout request for the lot, handled after we return to the event loop
+        for timestamp, target in targets:
+            self._add_spell(spell, timestamp, target)
+        self.timers_changed.emit()
+
+    def _add_spell(self, spell, timestamp, target):
+        spell_target = self._targets.get(target)
+        new = spell_target is None
+        if new:
             spell_target = SpellTarget(target=target)
-            self._layout.addWidget(spell_target, 0)
+            self._targets[target] = spell_target
+            sort_key = None
+        else:
+            sort_key = spell_target.sort_key()
 
         spell_target.add_spell(spell, timestamp)
 
+        # the spell may have changed the TargetType, move the target to its new place
+        if spell_target.sort_key() != sort_key:
+            if not new:
+                self._ordered.remove(spell_target)
+                self._layout.removeWidget(spell_target)
+            index = bisect.bisect(self._ordered, spell_target.sort_key(), key=SpellTarget.sort_key)
+            self._ordered.insert(index, spell_target)
+            self._layout.insertWidget(index, spell_target, 0)
         if new:
-            for x, widget in enumerate(sorted(self.findChildren(SpellTarget),
-                                              key=lambda x: (int(x.target_label.property('TargetType')), x.name))):
-                self._layout.insertWidget(x, widget, 0)  # + 1 - skip target label
+            spell_target.spell_removed.connect(self.timers_changed)
+
+    def childEvent(self, event):
+        if event.type() == QEvent.Type.ChildRemoved:
+            spell_target = event.child()
+            if isinstance(spell_target, SpellTarget):
+                if self._targets.get(spell_target.name) is spell_target:
+                    del self._targets[spell_target.name]
+                if spell_target in self._ordered:
+                    self._ordered.remove(spell_target)
+        super().childEvent(event)
+
+    def remove_spell(self, spell_name, target='__you__'):
+        spell_target = self._targets.get(target)
+        if spell_target:
+            spell_target.remove_spell(spell_name)
 
     def spell_targets(self):
         """Returns a list of all SpellTargets."""
-        return self.findChildren(SpellTarget)
+        return list(self._ordered)
 
     def get_spell_target_by_name(self, name):
-        spell_targets = [
-            target for target in self.spell_targets() if target.name == name]
-        if spell_targets:
-            return spell_targets[0]
-        return None
+        return self._targets.get(name)
 
 
 class SpellTarget(QFrame):
 
+    spell_removed = pyqtSignal()
+
     def __init__(self, target='__you__'):
         super().__init__()
         self.name = target
@@ -228,6 +293,8 @@ class SpellTarget(QFrame):
             self.title = target
         self._initialized = False  # don't delete until after first spell
         self.setObjectName('SpellContainer')
+        self._spells = {}  # spell name: SpellWidget
+        self._ordered = []  # SpellWidgets by end_time, in layout order after the label
 
         self._setup_ui()
 
@@ -244,42 +311,60 @@ class SpellTarget(QFrame):
         self._layout.addWidget(self.target_label, 0)
         self._layout.addStretch()
 
+    def sort_key(self):
+        return int(self.target_label.property('TargetType')), self.name
+
     def _remove(self, event=None):
+        for spell_widget in self.spell_widgets():
+            spell_widget.stop()
         self.setParent(None)
         self.deleteLater()
 
     def spell_widgets(self):
         """Returns a list of all SpellWidgets."""
-        return self.findChildren(SpellWidget)
+        return list(self._ordered)
+
+    def remove_spell(self, spell_name):
+        spell_widget = self._spells.get(spell_name)
+        if spell_widget:
+            spell_widget._remove()
 
     def childEvent(self, event):
         if event.type() == QEvent.Type.ChildRemoved:
-            if isinstance(event.child(), SpellWidget):
-                if not self.findChildren(SpellWidget):
+            spell_widget = event.child()
+            if isinstance(spell_widget, SpellWidget):
+                if self._spells.get(spell_widget.spell.name) is spell_widget:
+                    del self._spells[spell_widget.spell.name]
+                if spell_widget in self._ordered:
+                    self._ordered.remove(spell_widget)
+                self.spell_removed.emit()
+                if not self._spells:
                     self._remove()
         event.accept()
 
     def add_spell(self, spell, timestamp):
-        target_type = spell.type  # default incoming spell type
-        recast = False
-        for sw in self.findChildren(SpellWidget):
-            target_type *= sw.spell.type
-            if sw.spell.name == spell.name:
-                recast = True
-                sw.recast(timestamp)
-        if not recast:
-            self._layout.addWidget(SpellWidget(spell, timestamp))
-        if self.name in ('__you__', '__custom__'):
-            self.target_label.setProperty('TargetType', 0)  # user
-        elif not target_type:  # treat target like enemy
-            self.target_label.setProperty('TargetType', 2)  # enemy
+        spell_widget = self._spells.get(spell.name)
+        if spell_widget:
+            spell_widget.recast(timestamp)
+            self._ordered.remove(spell_widget)
         else:
-            self.target_label.setProperty('TargetType', 1)  # friendly
-        self.target_label.setStyle(self.target_label.style())
+            spell_widget = SpellWidget(spell, timestamp)
+            self._spells[spell.name] = spell_widget
 
-        now = datetime.datetime.now()
-        for x, widget in enumerate(sorted(self.findChildren(SpellWidget), key=lambda x: (x.end_time - now))):
-            self._layout.insertWidget(x + 1, widget)  # + 1 - skip target label
+        # only the cast spell moves, to its place by end time
+        index = bisect.bisect(self._ordered, spell_widget.end_time, key=lambda sw: sw.end_time)
+        self._ordered.insert(index, spell_widget)
+        self._layout.insertWidget(index + 1, spell_widget)  # + 1 - skip target label
+
+        if self.name in ('__you__', '__custom__'):
+            target_type = 0  # user
+        elif not spell.type or any(not sw.spell.type for sw in self._ordered):
+            target_type = 2  # treat target like enemy
+        else:
+            target_type = 1  # friendly
+        if self.target_label.property('TargetType') != target_type:
+            self.target_label.setProperty('TargetType', target_type)
+            self.target_label.setStyle(self.target_label.style())
 
 
 class SpellWidget(QFrame):
@@ -290,11 +375,15 @@ class SpellWidget(QFrame):
         self.spell = spell
         self._active = True
 
+        self._expiry = None  # TimerWheel handle of _expire
+        self._warning = False
+
         self._setup_ui()
         self._calculate(timestamp)
         self.setProperty('Warning', False)
         self._time_label.setProperty('Warning', False)
-        self._update()
+        self._refresh()
+        get_timer_wheel().add(self._update)
 
     def _calculate(self, timestamp):
         self._ticks = get_spell_duration(
@@ -302,6 +391,21 @@ class SpellWidget(QFrame):
         self._seconds = (int(self._ticks * 6))
         self.end_time = timestamp + datetime.timedelta(seconds=self._seconds)
         self.progress.setMaximum(self._seconds)
+        self._schedule_expiry()
+
+    def _schedule_expiry(self, when=None):
+        wheel = get_timer_wheel()
+        wheel.cancel(self._expiry)
+        self._expiry = wheel.call_at(when or self.end_time, self._expire)
+
+    def _expire(self):
+        self._expiry = None
+        now = datetime.datetime.now()
+        if self._active and self.end_time <= now:
+            self._remove()
+        else:
+            # paused while zoning, or elongated meanwhile
+            self._schedule_expiry(max(self.end_time, now + datetime.timedelta(seconds=1)))
 
     def _setup_ui(self):
         # self
@@ -335,26 +439,32 @@ class SpellWidget(QFrame):
 
     def recast(self, timestamp):
         self._calculate(timestamp)
-        self.setProperty('Warning', False)
-        self.setStyle(self.style())
-        self._time_label.setProperty('Warning', False)
-        self._time_label.setStyle(self._time_label.style())
+        self._set_warning(False)
+        self._refresh()
+
+    def _set_warning(self, warning):
+        # restyling is expensive, only do it when the state flips
+        if warning != self._warning:
+            self._warning = warning
+            self.setProperty('Warning', warning)
+            self.setStyle(self.style())
+            self._time_label.setProperty('Warning', warning)
+            self._time_label.setStyle(self._time_label.style())
 
     def _update(self):
-        if self._active:
-            remaining = self.end_time - datetime.datetime.now()
-            remaining_seconds = remaining.total_seconds()
-            self.progress.setValue(remaining.seconds)
-            self.progress.update()
-            if remaining_seconds <= 30:
-                self.setProperty('Warning', True)
-                self.setStyle(self.style())
-                self._time_label.setProperty('Warning', True)
-                self._time_label.setStyle(self._time_label.style())
-            if remaining_seconds <= 0:
-                self._remove()
-            self._time_label.setText(format_time(remaining))
-        QTimer.singleShot(1000, self._update)
+        # called every second by the timer wheel, expiry is scheduled apart in _expire
+        if self._active and self.isVisible():
+            self._refresh()
+
+    def _refresh(self):
+        remaining = self.end_time - datetime.datetime.now()
+        remaining_seconds = remaining.total_seconds()
+        if remaining_seconds <= 0:
+            return
+        self.progress.setValue(remaining.seconds)
+        self.progress.update()
+        self._set_warning(remaining_seconds <= 30)
+        self._time_label.setText(format_time(remaining))
 
     def pause(self):
         self._active = False
@@ -362,214 +472,25 @@ class SpellWidget(QFrame):
     def resume(self):
         self._active = True
 
+    @property
+    def active(self):
+        return self._active
+
     def elongate(self, seconds):
         self.end_time += datetime.timedelta(seconds=seconds)
+        self._schedule_expiry()
+
+    def stop(self):
+        """Stop updating, before the widget is deleted."""
+        wheel = get_timer_wheel()
+        wheel.remove(self._update)
+        wheel.cancel(self._expiry)
+        self._expiry = None
 
     def _remove(self):
+        self.stop()
         self.setParent(None)
         self.deleteLater()
 
     def mouseDoubleClickEvent(self, _):
         self._remove()
-
-
-def get_spell_icon(icon_index):
-    # Spell Icons are 40x40 pixels
-    file_number = math.ceil(icon_index / 36)
-    file_name = 'data/spells/spells0' + str(file_number) + '.png'
-    spell_number = icon_index % 36
-    file_row = math.floor((spell_number + 6) / 6)
-    file_col = spell_number % 6 + 1
-    x = (file_col - 1) * 40
-    y = (file_row - 1) * 40
-    icon_image = QPixmap(file_name)
-    scaled_icon_image = icon_image.copy(QRect(x, y, 40, 40)).scaled(
-        15, 15, transformMode=Qt.TransformationMode.SmoothTransformation)
-    label = QLabel()
-    label.setPixmap(scaled_icon_image)
-    label.setFixedSize(15, 15)
-    return label
-
-
-class Spell:
-
-    def __init__(self, **kwargs):
-        self.id = 0
-        self.name = ''
-        self.effect_text_you = ''
-        self.effect_text_other = ''
-        self.effect_text_worn_off = ''
-        self.aoe_range = 0
-        self.max_targets = 1
-        self.cast_time = 0
-        self.resist_type = 0
-        self.duration_formula = 0
-        self.pvp_duration_formula = 0
-        self.duration = 0
-        self.pvp_duration = 0
-        self.type = 0
-        self.spell_icon = 0
-        self.__dict__.update(kwargs)
-
-
-class SpellTrigger(QObject):
-
-    spell_triggered = pyqtSignal()
-
-    def __init__(self, **kwargs):
-        super().__init__()
-        self.timestamp = None  # datetime
-        self.spell = None  # Spell
-        self.__dict__.update(kwargs)
-
-        self.targets = []  # [(timestamp, target)]
-        self.activated = False
-
-        # create casting trigger window
-        self._times_up_timer = QTimer()
-        self._times_up_timer.setSingleShot(True)
-        self._times_up_timer.timeout.connect(self._times_up)
-        self._activate_timer = QTimer()
-        self._activate_timer.setSingleShot(True)
-        self._activate_timer.timeout.connect(self._activate)
-
-        if config.data['spells']['use_casting_window']:
-            #  just in case user set casting window buffer super low, create offset for more accuracy.
-            msec_offset = (datetime.datetime.now() -
-                           self.timestamp).total_seconds() * 1000
-            self._times_up_timer.start(
-                self.spell.cast_time + config.data['spells']['casting_window_buffer'] - msec_offset)
-            self._activate_timer.start(
-                self.spell.cast_time - config.data['spells']['casting_window_buffer'] - msec_offset)
-        else:
-            self.activated = True
-
-    def parse(self, timestamp, text):
-        if self.activated:
-            if self.spell.effect_text_you and text[:len(self.spell.effect_text_you)] == self.spell.effect_text_you:
-                # cast self
-                self.targets.append((timestamp, '__you__'))
-            elif text[len(text) - len(self.spell.effect_text_other):] == self.spell.effect_text_other and \
-                    len(self.spell.effect_text_other) > 0:
-                # cast other
-                target = text[:len(text) -
-                              len(self.spell.effect_text_other)].strip()
-                self.targets.append((timestamp, target))
-            if self.targets and self.spell.max_targets == 1:
-                self.stop()  # make sure you don't get two triggers
-                self.spell_triggered.emit()
-
-    def _times_up(self):
-        self.spell_triggered.emit()
-
-    def _activate(self):
-        self.activated = True
-
-    def stop(self):
-        self._times_up_timer.stop()
-        self._activate_timer.stop()
-
-
-def create_spell_book():
-    """ Returns a dictionary of Spell by k, v -> spell_name, Spell() """
-    spell_book = {}
-    text_lookup_self = {}
-    text_lookup_other = {}
-    with open('data/spells/spells_us.txt') as spell_file:
-        for line in spell_file:
-            values = line.strip().split('^')
-            spell = Spell(
-                id=int(values[0]),
-                name=values[1].lower(),
-                effect_text_you=values[6],
-                effect_text_other=values[7],
-                effect_text_worn_off=values[8],
-                aoe_range=int(values[10]),
-                max_targets=(6 if int(values[10]) > 0 else 1),
-                cast_time=int(values[13]),
-                resist_type=int(values[85]),
-                duration_formula=int(values[16]),
-                pvp_duration_formula=int(values[181]),
-                duration=int(values[17]),
-                pvp_duration=int(values[182]),
-                type=int(values[83]),
-                spell_icon=int(values[144])
-            )
-            spell_book[values[1]] = spell
-            text_lookup_self[spell.effect_text_you] = spell
-            text_lookup_other[spell.effect_text_other] = spell
-    return spell_book, text_lookup_self, text_lookup_other
-
-
-def get_spell_duration(spell, level):
-    if spell.name in config.data['spells']['use_secondary']:
-        formula, duration = spell.pvp_duration_formula, spell.pvp_duration
-    elif config.data['spells']['use_secondary_all'] and spell.type == 0:
-        formula, duration = spell.pvp_duration_formula, spell.pvp_duration
-    else:
-        formula, duration = spell.duration_formula, spell.duration
-
-    spell_ticks = 0
-    if formula == 0:
-        spell_ticks = 0
-    if formula == 1:
-        spell_ticks = int(math.ceil(level / float(2.0)))
-        spell_ticks = min(spell_ticks, duration)
-    if formula == 2:
-        spell_ticks = int(math.ceil(level / float(5.0) * 3))
-        spell_ticks = min(spell_ticks, duration)
-    if formula == 3:
-        spell_ticks = int(level * 30)
-        spell_ticks = min(spell_ticks, duration)
-    if formula == 4:
-        if duration == 0:
-            spell_ticks = 50
-        else:
-            spell_ticks = duration
-    if formula == 5:
-        spell_ticks = duration
-        if spell_ticks == 0:
-            spell_ticks = 3
-    if formula == 6:
-        spell_ticks = int(math.ceil(level / float(2.0)))
-        spell_ticks = min(spell_ticks, duration)
-    if formula == 7:
-        spell_ticks = level
-        spell_ticks = min(spell_ticks, duration)
-    if formula == 8:
-        spell_ticks = level + 10
-        spell_ticks = min(spell_ticks, duration)
-    if formula == 9:
-        spell_ticks = int((level * 2) + 10)
-        spell_ticks = min(spell_ticks, duration)
-    if formula == 10:
-        spell_ticks = int(level * 3 + 10)
-        spell_ticks = min(spell_ticks, duration)
-    if formula == 11:
-        spell_ticks = duration
-    if formula == 12:
-        spell_ticks = duration
-    if formula == 15:
-        spell_ticks = duration
-    if formula == 50:
-        spell_ticks = 72000
-    if formula == 3600:
-        if duration == 0:
-            spell_ticks = 3600
-        else:
-            spell_ticks = duration
-    return spell_ticks
-
-
-class CustomTrigger:
-
-    def __init__(self, name='', text='', time='', **_):
-        self.name, self.text, self.time = name, text, time
-
-    def to_list(self):
-        return [self.name, self.text, self.time]
-
-    def __str__(self):
-        return '{},{},{}'.format(
-            self.name, self.text, self.time
-        )
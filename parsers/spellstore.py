@@ -0,0 +1,80 @@
+"""
+Snapshot of the running spell timers, written to a small file shortly after they change
+and read back on launch, so restarting nParse keeps the buffs counting down.
+"""
+import datetime
+import json
+import os
+
+from PyQt6.QtCore import QObject, QTimer
+
+SPELL_TIMERS_FILE = 'data/spells/timers.json'
+SAVE_DELAY_MSEC = 2000  # changes within this are written together
+# zoning takes seconds, timers paused in a snapshot older than this resume on restore
+PAUSE_TIMEOUT = datetime.timedelta(seconds=120)
+
+
+class SpellTimerStore(QObject):
+    """
+    Saves the entries returned by snapshot(), dictionaries of:
+        target: name of the SpellTarget
+        spell_id: Spell.id, or name and duration (ticks) for custom timers
+        end_time: datetime.timestamp() of the end of the spell
+        paused: true while zoning
+    """
+
+    def __init__(self, snapshot, file_name=SPELL_TIMERS_FILE):
+        super().__init__()
+        self.file_name = file_name
+        self._snapshot = snapshot
+        self._timer = QTimer()
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(SAVE_DELAY_MSEC)
+        self._timer.timeout.connect(self.save)
+
+    def save_later(self):
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        """Write a pending snapshot now."""
+        if self._timer.isActive():
+            self.save()
+
+    def save(self):
+        self._timer.stop()
+        data = {
+            'saved': datetime.datetime.now().timestamp(),
+            'timers': self._snapshot()
+        }
+        # write aside and swap, a crash while writing keeps the last snapshot
+        temp_name = self.file_name + '.tmp'
+        try:
+            with open(temp_name, 'w') as f:
+                json.dump(data, f)
+            os.replace(temp_name, self.file_name)
+        except OSError as error:
+            print('Unable to save spell timers: {}'.format(error))
+
+    def load(self):
+        """Returns the saved entries still running, end_time as a datetime."""
+        try:
+            with open(self.file_name) as f:
+                data = json.load(f)
+            saved = datetime.datetime.fromtimestamp(data['saved'])
+            timers = data['timers']
+        except (OSError, ValueError, KeyError, TypeError):
+            return []
+
+        now = datetime.datetime.now()
+        resume = now - saved > PAUSE_TIMEOUT
+        restored = []
+        for entry in timers:
+            try:
+                entry['end_time'] = datetime.datetime.fromtimestamp(entry['end_time'])
+                entry['paused'] = bool(entry.get('paused')) and not resume
+            except (KeyError, TypeError, ValueError, OSError):
+                continue
+            if 'target' in entry and (entry['paused'] or entry['end_time'] > now):
+                restored.append(entry)
+        return restored
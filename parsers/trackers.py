@@ -0,0 +1,404 @@
+"""
+Qt-free parser state machines.
+
+Trackers follow the same log lines as the parser windows but keep their state in
+plain python objects and publish what they detect as Events to subscribers, so they
+can run headless over archived logs, in tests and in benchmarks.
+"""
+import datetime
+import re
+import time
+from collections import namedtuple
+from itertools import chain
+
+from helpers import Parser, config, text_time_to_seconds, to_real_xy
+from helpers.triggers import TriggerRegistry
+
+from .deathloopvaccine import DeathLoopVaccine
+from .spellbook import (CustomTimerMatcher, create_custom_spell, create_effect_index,
+                        create_spell_book, get_spell_duration)
+
+# /who output, e.g. "There are 5 players in East Freeport."
+ZONE_MATCHER = re.compile(r"There (is|are) \d+ players? in (?P<zone>.+)\.")
+
+# log timestamps only have a resolution of one second
+TIMESTAMP_RESOLUTION = datetime.timedelta(seconds=1)
+
+Event = namedtuple('Event', ['name', 'timestamp', 'data'])
+
+
+class Tracker(Parser):
+    """Parser publishing Events to subscribed callbacks instead of updating widgets."""
+
+    def __init__(self):
+        super().__init__()
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        """Call callback(Event) for every event this tracker publishes."""
+        self._subscribers.append(callback)
+
+    def emit(self, name, timestamp, **data):
+        event = Event(name, timestamp, data)
+        for callback in self._subscribers:
+            callback(event)
+
+    def flush(self, timestamp=None):
+        """Finish any state waiting for lines that will never come, e.g. at the end of a replay."""
+
+
+class CastingWindow:
+    """
+    Landing window of a spell cast, evaluated against log line timestamps.
+
+    Landing messages are only accepted between cast_time - casting_window_buffer and
+    cast_time + casting_window_buffer after the cast began, widened by the resolution
+    of the log timestamps.
+    """
+
+    def __init__(self, spell, timestamp):
+        self.spell = spell
+        self.timestamp = timestamp
+        self.targets = []  # [(timestamp, target)]
+        if config.data['spells']['use_casting_window']:
+            cast_time = datetime.timedelta(milliseconds=spell.cast_time)
+            buffer = datetime.timedelta(
+                milliseconds=config.data['spells']['casting_window_buffer'])
+            self.opens = timestamp + cast_time - buffer - TIMESTAMP_RESOLUTION
+            self.closes = timestamp + cast_time + buffer + TIMESTAMP_RESOLUTION
+        else:
+            self.opens = timestamp
+            self.closes = None
+
+    def is_active(self, timestamp):
+        return timestamp >= self.opens
+
+    def is_expired(self, timestamp):
+        return self.closes is not None and timestamp > self.closes
+
+    def parse(self, timestamp, landings):
+        """Collect a landing target from a line's Landings, returns true once the window is complete."""
+        if not self.is_active(timestamp):
+            return False
+        for landing in landings:
+            if landing.is_of(self.spell):
+                self.targets.append((timestamp, landing.target))
+                break
+        return bool(self.targets) and self.spell.max_targets == 1
+
+
+class SpellTracker(Tracker):
+    """
+    Tracks spell casts, landings and durations by target.
+
+    This is the spell parsing of nParse, the Spells window wraps one and shows the
+    timers it publishes.
+
+    Events:
+        casting: spell, a casting window opened for a cast or item click
+        spell_landed: spell, targets [(timestamp, target)], every target of the cast at once
+        spell_seen: target, spells, a landing message of any of spells, cast by anyone
+        spell_expired: spell, target
+        spell_worn_off: spell, target, the game reported it fading before its end_time
+        spell_interrupted: spell
+        zoning: (self buff timers are on hold)
+        zoned: delay, seconds added to self buff timers
+    """
+
+    def __init__(self, spell_book=None):
+        super().__init__()
+        self.name = 'spells'
+        # the spell book takes a while to read and a few MB to hold, it is read when the
+        # triggers are first registered, so not at all while the spells parser is off
+        self._spell_book = spell_book  # (spell_book, text_you, text_other) of create_spell_book
+        self._effect_index = None
+        self.timers = {}  # target: {spell name: [end_time, Spell]}
+        self.window = None  # CastingWindow of the last cast or item click
+        self.zoning = None  # holds time of zone or None
+        self._next_expiry = None
+        self._last_line = None  # (timestamp, time.monotonic()) of the last line in a window
+        self._custom_timers = CustomTimerMatcher(config.data['spells']['custom_timers'])
+        self._triggers = TriggerRegistry()  # registered on the first parse
+
+    @property
+    def spell_book(self):
+        """Spell by name."""
+        return self._get_spell_book()[0]
+
+    @property
+    def text_you(self):
+        """Spell by effect_text_you."""
+        return self._get_spell_book()[1]
+
+    @property
+    def text_other(self):
+        """Spell by effect_text_other."""
+        return self._get_spell_book()[2]
+
+    @property
+    def effect_index(self):
+        if self._effect_index is None:
+            self._effect_index = create_effect_index(*self._get_spell_book())
+        return self._effect_index
+
+    def _get_spell_book(self):
+        if self._spell_book is None:
+            self._spell_book = create_spell_book()
+        return self._spell_book
+
+    def load_custom_timers(self):
+        self._custom_timers = CustomTimerMatcher(config.data['spells']['custom_timers'])
+        self.triggers_changed()
+
+    def triggers_changed(self):
+        """Have the triggers registered again, e.g. after custom timers were switched on or off."""
+        self._triggers.clear()
+        Parser.toggle_generation += 1
+
+    def register_triggers(self, registry):
+        # landing, item click and worn off messages are looked up by their exact text, or
+        # the end of the line for landings on others, so other lines do not get here
+        for text in chain(self.effect_index.you, self.effect_index.worn_off, self.text_you):
+            registry.add_text(text, self._effect_line)
+        for text in self.effect_index.other:
+            registry.add_suffix(text, self._effect_line)
+        # custom timers may match any line
+        if config.data['spells']['use_custom_triggers'] and len(self._custom_timers):
+            registry.add_line_handler(self._custom_timer_line)
+        registry.add_prefix('You begin casting', self._casting_started)
+        for prefix in ('Your spell is interrupted.',
+                       'Your target resisted',
+                       'Your spell did not take hold.',
+                       'You try to cast a spell on'):
+            registry.add_prefix(prefix, self._casting_interrupted)
+        registry.add_prefix('LOADING, PLEASE WAIT...', self._zoning_started)
+        registry.add_prefix('You have entered', self._zone_entered)
+
+    def parse(self, timestamp, text):
+        if not self._triggers:
+            self.register_triggers(self._triggers)
+        self._triggers.dispatch(timestamp, text)
+
+    def flush(self, timestamp=None):
+        self._window_done()
+        if timestamp:
+            self._expire(timestamp)
+
+    def flush_window(self):
+        """Close a casting window no line came after, log time went on as much as the clock did."""
+        if self.window:
+            timestamp, received = self._last_line
+            now = timestamp + datetime.timedelta(seconds=time.monotonic() - received)
+            if self.window.is_expired(now):
+                self._window_done()
+
+    def add_timer(self, spell, timestamp, target):
+        """Start a timer for spell landing on target at timestamp."""
+        self._add_timers(spell, [(timestamp, target)])
+
+    def _line_seen(self, timestamp):
+        # the casting window is evaluated against line timestamps, so it holds
+        # up the same when the log is read behind or replayed
+        if self.window:
+            self._last_line = (timestamp, time.monotonic())
+            if self.window.is_expired(timestamp):
+                self._window_done()
+        if self._next_expiry and timestamp >= self._next_expiry and not self.zoning:
+            self._expire(timestamp)
+
+    def _custom_timer_line(self, timestamp, text):
+        if not config.data['spells']['use_custom_triggers']:
+            return
+        for ct in self._custom_timers.matches(text):
+            spell = create_custom_spell(ct.name, int(text_time_to_seconds(ct.time)/6))
+            self.add_timer(spell, timestamp, '__custom__')
+
+    def _effect_line(self, timestamp, text):
+        self._line_seen(timestamp)
+
+        # There are three main cases:
+        # 1) Items that have cast messages like "<item> begins to glow."
+        # 2) Items that have no cast message, cast on you (mostly insta-clickies)
+        # 3) Items that have no cast message, cast on others
+        # Case 1 may require either compiling a list of these items and detecting
+        # them as triggers, or else opening it up entirely like this does.
+        # Case 2 requires completely opening up detection, but will also detect
+        # any other buff cast on you, which may include things you wouldn't expect
+        # but can also NOT include many spells (when text is shared with an AoE
+        # version). It would also not properly detect level of spell when cast
+        # by other people.
+        # Case 3 is essentially impossible to deal with.
+        if config.data['spells']['use_item_triggers'] and not self.window:
+            if text in self.text_you:
+                self._open_window(self.text_you[text], timestamp)
+
+        spell_ids = self.effect_index.worn_off.get(text)
+        if spell_ids:
+            self._worn_off(timestamp, spell_ids)
+
+        landings = self.effect_index.landings(text)
+        if landings:
+            if self.window and self.window.parse(timestamp, landings):
+                self._window_done()
+            for landing in landings:
+                self.emit('spell_seen', timestamp, target=landing.target, spells=landing.spells)
+
+    def _casting_started(self, timestamp, text):
+        self._line_seen(timestamp)
+        spell = self.spell_book.get(text[18:-1], None)
+        if spell and spell.duration_formula != 0:
+            self._window_done()  # in case we cut off the cast window, force trigger
+            self._open_window(spell, timestamp)
+
+    def _casting_interrupted(self, timestamp, text):
+        self._line_seen(timestamp)
+        if self.window:
+            self.emit('spell_interrupted', timestamp, spell=self.window.spell)
+        self.window = None
+
+    def _zoning_started(self, timestamp, text):
+        self._line_seen(timestamp)
+        self._window_done()
+        self.zoning = timestamp
+        self.emit('zoning', timestamp)
+
+    def _zone_entered(self, timestamp, text):
+        if not self.zoning:
+            return
+        delay = (timestamp - self.zoning).total_seconds()
+        self.zoning = None
+        # If zoning took longer than like two minutes, likely false alarm
+        if delay > 120:
+            delay = 0
+        for timer in self.timers.get('__you__', {}).values():
+            timer[0] += datetime.timedelta(seconds=delay)
+        self._update_next_expiry()
+        self.emit('zoned', timestamp, delay=delay)
+
+    def _open_window(self, spell, timestamp):
+        self.window = CastingWindow(spell, timestamp)
+        self._last_line = (timestamp, time.monotonic())
+        self.emit('casting', timestamp, spell=spell)
+
+    def _window_done(self):
+        window, self.window = self.window, None
+        if window and window.targets:
+            self._add_timers(window.spell, window.targets)
+
+    def _add_timers(self, spell, targets):
+        ticks = get_spell_duration(spell, config.data['spells']['level'])
+        duration = datetime.timedelta(seconds=int(ticks * 6))
+        for timestamp, target in targets:
+            end_time = timestamp + duration
+            self.timers.setdefault(target, {})[spell.name] = [end_time, spell]
+            if not self._next_expiry or end_time < self._next_expiry:
+                self._next_expiry = end_time
+        self.emit('spell_landed', targets[0][0], spell=spell, targets=targets)
+
+    def _expire(self, timestamp):
+        for target in list(self.timers):
+            spells = self.timers[target]
+            for name in [name for name, (end_time, _) in spells.items() if end_time <= timestamp]:
+                _, spell = spells.pop(name)
+                self.emit('spell_expired', timestamp, spell=spell, target=target)
+            if not spells:
+                del self.timers[target]
+        self._update_next_expiry()
+
+    def _worn_off(self, timestamp, spell_ids):
+        spells = self.timers.get('__you__', {})
+        # of the spells sharing the message, the one due first is fading
+        names = [(end_time, name) for name, (end_time, spell) in spells.items()
+                 if spell.id in spell_ids]
+        if not names:
+            return
+        _, spell = spells.pop(min(names)[1])
+        if not spells:
+            del self.timers['__you__']
+        self._update_next_expiry()
+        self.emit('spell_worn_off', timestamp, spell=spell, target='__you__')
+
+    def _update_next_expiry(self):
+        self._next_expiry = min(
+            (end_time for spells in self.timers.values() for end_time, _ in spells.values()),
+            default=None
+        )
+
+
+class ZoneTracker(Tracker):
+    """
+    Tracks the current zone, location and deaths of the player.
+
+    This is the zone parsing of nParse, the Maps window wraps one.
+
+    Events:
+        zoning: (loading screen, the next zone is about to be entered)
+        zone_changed: zone
+        who_zone: zone, as a /who lists it
+        location: x, y, z (converted with to_real_xy like the map)
+        player_died: zone
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.name = 'maps'
+        self.zone = None
+        self.location = None  # (x, y, z)
+        self._triggers = TriggerRegistry()
+        self.register_triggers(self._triggers)
+
+    def register_triggers(self, registry):
+        registry.add_prefix('LOADING, PLEASE WAIT...', self._zoning_started)
+        registry.add_prefix('You have entered', self._zone_entered)
+        registry.add_regex(ZONE_MATCHER, self._who_zone)
+        registry.add_prefix('Your Location is', self._location)
+        registry.add_prefix('You have been slain', self._player_died)
+
+    def parse(self, timestamp, text):
+        self._triggers.dispatch(timestamp, text)
+
+    def _zoning_started(self, timestamp, text):
+        self.emit('zoning', timestamp)
+
+    def _zone_entered(self, timestamp, text):
+        self.zone = text[17:-1]
+        self.location = None
+        self.emit('zone_changed', timestamp, zone=self.zone)
+
+    def _who_zone(self, timestamp, text, match):
+        self.emit('who_zone', timestamp, zone=match.group('zone'))
+
+    def _location(self, timestamp, text):
+        try:
+            x, y, z = [float(value) for value in text[17:].strip().split(',')]
+        except ValueError:
+            return
+        x, y = to_real_xy(x, y)
+        self.location = (x, y, z)
+        self.emit('location', timestamp, x=x, y=y, z=z)
+
+    def _player_died(self, timestamp, text):
+        self.emit('player_died', timestamp, zone=self.zone)
+
+
+class DeathLoopTracker(Tracker, DeathLoopVaccine):
+    """
+    DeathLoopVaccine that publishes a deathloop event instead of killing eqgame.exe.
+
+    Events:
+        deathloop: deaths, the death messages inside the window
+    """
+
+    def check_for_death(self, timestamp, text):
+        self._timestamp = timestamp
+        super().check_for_death(timestamp, text)
+
+    def deathloop_response(self):
+        if len(self._death_list) >= config.data['deathloopvaccine']['deaths']:
+            self.emit('deathloop', self._timestamp, deaths=list(self._death_list))
+            self.reset()
+
+
+def create_trackers(spell_book=None):
+    """Returns a new set of the headless trackers."""
+    return [ZoneTracker(), SpellTracker(spell_book), DeathLoopTracker()]
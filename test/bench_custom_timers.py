@@ -0,0 +1,91 @@
+"""
+Custom timer matching speed, run from the nparse directory:
+
+    python -m test.bench_custom_timers [log file]
+
+Times the previous loop over one regex per custom timer against CustomTimerMatcher
+with 10, 100 and 1000 custom timers, over the lines of the given log or made up ones.
+"""
+import random
+import re
+import sys
+import time
+
+from parsers.spellbook import CustomTimerMatcher, custom_timer_pattern
+
+SIZES = (10, 100, 1000)
+WILDCARD_FIRST = 0.05  # share of custom timers starting with *
+
+
+def make_custom_timers(count, rng):
+    timers = []
+    for number in range(count):
+        if rng.random() < WILDCARD_FIRST:
+            text = '*tells you, \'timer {}\''.format(number)
+        elif number % 3:
+            text = 'Your skin tingles with timer {}.'.format(number)
+        else:
+            text = 'You feel the timer {} * you.'.format(number)
+        timers.append(['timer {}'.format(number), text, '00:01:00'])
+    return timers
+
+
+def make_lines(count, rng):
+    lines = [
+        'You begin casting Complete Heal.',
+        'a gnoll hits YOU for 12 points of damage.',
+        'Soandso tells you, \'timer 7\'',
+        'You feel the timer 3 surround you.',
+        'Your skin tingles with timer 4.',
+        'You have entered The North Karana.',
+    ]
+    return [rng.choice(lines) for _ in range(count)]
+
+
+def read_lines(file_name):
+    with open(file_name, encoding='utf-8', errors='replace') as log:
+        return [line[27:].rstrip('\n') for line in log]
+
+
+def loop_matches(custom_timers, lines):
+    regexes = [
+        re.compile('^{}$'.format(custom_timer_pattern(text)), re.RegexFlag.IGNORECASE)
+        for _, text, _ in custom_timers
+    ]
+    found = 0
+    for text in lines:
+        for rx in regexes:
+            if rx.match(text):
+                found += 1
+    return found
+
+
+def matcher_matches(custom_timers, lines):
+    matcher = CustomTimerMatcher(custom_timers)
+    found = 0
+    for text in lines:
+        found += len(matcher.matches(text))
+    return found
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    rng = random.Random(1999)
+    lines = read_lines(sys.argv[1]) if len(sys.argv) > 1 else make_lines(20000, rng)
+    print('{:,} lines'.format(len(lines)))
+    for size in SIZES:
+        custom_timers = make_custom_timers(size, rng)
+        loop_found, loop_time = timed(loop_matches, custom_timers, lines)
+        matcher_found, matcher_time = timed(matcher_matches, custom_timers, lines)
+        assert loop_found == matcher_found, (loop_found, matcher_found)
+        print('{:>5} timers  loop {:>7.3f}s  matcher {:>7.3f}s  {:>6.1f}x  ({:,} matches)'.format(
+            size, loop_time, matcher_time, loop_time / matcher_time, matcher_found))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+"""
+Spell book memory and load time, run from the nparse directory:
+
+    python -m test.bench_spell_book
+
+Compares the slotted Spell with the previous plain object Spell that kept its
+attributes in a __dict__, both built from the same spells_us.txt rows.
+"""
+import gc
+import os
+import tempfile
+import time
+import tracemalloc
+
+from helpers import config
+from parsers import spellbook
+
+
+class DictSpell:
+    """Spell as it was before __slots__."""
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def build_book(spell_class, rows):
+    keys = [key for key, _, _ in spellbook.SPELL_COLUMNS]
+    book = {}
+    for row in rows:
+        values = dict(zip(keys, row))
+        values['max_targets'] = 6 if values['aoe_range'] > 0 else 1
+        book[values['name']] = spell_class(**values)
+    return book
+
+
+def main():
+    config.load('nparse.config.json')
+    config.verify_settings()
+
+    # time a cold load against a cache of our own, leaving the one nParse uses alone
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache_name = os.path.join(cache_dir, os.path.basename(spellbook.SPELL_CACHE))
+        _, _, cold = measure(lambda: spellbook.load_spell_rows(cache_name=cache_name))
+        rows, rows_size, warm = measure(lambda: spellbook.load_spell_rows(cache_name=cache_name))
+    print('{:,} spells'.format(len(rows)))
+    print('load spells_us.txt: {:.3f}s, from cache: {:.3f}s'.format(cold, warm))
+    print('rows: {:.2f} MB'.format(rows_size / 1024 / 1024))
+
+    for spell_class in (DictSpell, spellbook.Spell):
+        book, size, elapsed = measure(lambda: build_book(spell_class, rows))
+        print('{:<10} {:>8.2f} MB {:>6.0f} bytes/spell  built in {:.3f}s'.format(
+            spell_class.__name__, size / 1024 / 1024, size / len(book), elapsed))
+        del book
+
+    (book, _, _), size, _ = measure(spellbook.create_spell_book)
+    print('create_spell_book: {:.2f} MB including rows and text lookups'.format(
+        size / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
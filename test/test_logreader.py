@@ -0,0 +1,93 @@
+"""
+LogReader character switching and catch-up, run from the nparse directory:
+
+    python -m pytest test/test_logreader.py
+
+Log changes are handed to the reader directly instead of through its watcher.
+"""
+import datetime
+import os
+import tempfile
+import unittest
+
+from PyQt6.QtCore import QCoreApplication
+
+from helpers import config
+from helpers.logreader import LogReader
+
+APP = QCoreApplication.instance() or QCoreApplication([])
+
+
+def log_line(text, when=None):
+    when = when or datetime.datetime.now()
+    return '[{}] {}\r\n'.format(when.strftime('%a %b %d %H:%M:%S %Y'), text)
+
+
+class LogReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self._directory = tempfile.TemporaryDirectory()
+        self.directory = self._directory.name
+        config.load(os.path.join(self.directory, 'nparse.config.json'))
+        config.verify_settings()
+        config.char_name = ''
+        self.alpha = self.write('Alpha', log_line('You say, \'old\''))
+        self.beta = self.write('Beta', log_line('You say, \'old\''))
+
+    def tearDown(self):
+        self._directory.cleanup()
+
+    def write(self, name, *lines):
+        path = os.path.join(self.directory, 'eqlog_{}_P1999Green.txt'.format(name))
+        with open(path, 'a', newline='') as log:
+            log.write(''.join(lines))
+        return path
+
+    def create_reader(self, backend):
+        config.data['general']['log_watcher'] = backend
+        reader = LogReader(self.directory)
+        self.addCleanup(reader.stop)
+        batches, backlog = [], []
+        reader.new_lines.connect(batches.append)
+        reader.backlog_lines.connect(backlog.append)
+        return reader, batches, backlog
+
+    def check_login_switches_character(self, backend):
+        config.data['general']['catch_up'] = False
+        reader, batches, _ = self.create_reader(backend)
+        self.write('Alpha', log_line('You say, \'a1\''))
+        reader._file_changed(self.alpha)
+        self.assertEqual(config.char_name, 'Alpha')
+
+        # Beta logs in, the log is first opened once the zone line is written too
+        self.write('Beta', log_line('Welcome to EverQuest!'),
+                   log_line('You have entered East Freeport.'))
+        reader._file_changed(self.beta)
+        self.assertEqual(config.char_name, 'Beta')
+        self.assertEqual(batches[-1].char_name, 'Beta')
+        self.assertEqual([text for _, text in batches[-1]], ['You have entered East Freeport.'])
+
+        # Alpha writing on does not take over again
+        self.write('Alpha', log_line('You say, \'a2\''))
+        reader._file_changed(self.alpha)
+        self.assertEqual(config.char_name, 'Beta')
+
+    def test_login_switches_character_qt(self):
+        self.check_login_switches_character('qt')
+
+    def test_login_switches_character_polling(self):
+        self.check_login_switches_character('polling')
+
+    def test_catch_up_ends_where_reading_started(self):
+        config.data['general']['catch_up'] = True
+        reader, batches, backlog = self.create_reader('polling')
+        self.write('Alpha', log_line('You say, \'a1\''))
+        reader._file_changed(self.alpha)
+        self.assertEqual([text for batch in backlog for _, text in batch], ['You say, \'old\''])
+        self.assertTrue(all(batch.backlog for batch in backlog))
+        self.assertEqual([text for batch in batches for _, text in batch], ['You say, \'a1\''])
+        self.assertFalse(any(batch.backlog for batch in batches))
+
+
+if __name__ == '__main__':
+    unittest.main()